@@ -0,0 +1,50 @@
+"""
+Compares header-only image dimension probing with opening each image in PIL.
+
+Usage:
+    python benchmarks/bench_image_size.py [--images DIR] [--repeat N]
+"""
+import argparse
+import os
+import timeit
+
+from PIL import Image
+
+from IIIFingest.asset import get_image_size
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "tests", "images")
+
+
+def get_image_size_pil(file) -> tuple:
+    """The PIL-only implementation `get_image_size` replaced."""
+    with Image.open(file) as img:
+        w, h = img.size
+        return w, h
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", default=IMAGES_DIR, help="directory of images")
+    parser.add_argument("--repeat", type=int, default=200, help="passes per image")
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.images, name)
+        for name in os.listdir(args.images)
+        if not name.startswith(".")
+    )
+    for path in paths:
+        assert get_image_size(path) == get_image_size_pil(path), path
+
+    print(f"{len(paths)} images x {args.repeat} passes")
+    results = {}
+    for name, fn in (("pil", get_image_size_pil), ("header", get_image_size)):
+        seconds = timeit.timeit(lambda: [fn(p) for p in paths], number=args.repeat)
+        results[name] = seconds / (args.repeat * len(paths))
+        print(f"{name:>8}: {results[name] * 1e6:9.1f} us/image")
+    print(f" speedup: {results['pil'] / results['header']:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measures encoding an ingest request body for a batch of assets: the stdlib
+`json.dumps` used by `requests.post(json=...)` (the previous behaviour),
+`serializeJson` with and without orjson, and each of those gzipped as
+`sendIngestRequest` does above its `gzip_threshold`. Reports the encoding time
+and the bytes sent on the wire.
+
+Usage:
+    python benchmarks/bench_ingest_body.py [--assets N] [--repeat N]
+"""
+import argparse
+import gzip
+import json
+import timeit
+
+import IIIFingest.ingest
+from IIIFingest.ingest import createImageAsset, serializeJson, wrapIngestRequest
+from IIIFingest.settings import GZIP_COMPRESSLEVEL
+
+
+def make_request(count: int) -> dict:
+    assets = [
+        createImageAsset(
+            identifier=f"AT:BENCHMARKASSET{idx}",
+            space="atdarth",
+            storageSrcPath="benchmark/",
+            storageSrcKey=f"image{idx}.tif",
+            assetMetadata=[
+                {"fieldName": "imageSize", "jsonValue": {"width": 3000, "height": 4000}}
+            ],
+        )
+        for idx in range(count)
+    ]
+    return wrapIngestRequest(
+        metadata={}, assets=assets, manifest={}, space_default="atdarth"
+    )
+
+
+def requests_json(req: dict) -> bytes:
+    return json.dumps(req, allow_nan=False).encode("utf-8")
+
+
+def stdlib_json(req: dict) -> bytes:
+    orjson = IIIFingest.ingest.orjson
+    IIIFingest.ingest.orjson = None
+    try:
+        return serializeJson(req)
+    finally:
+        IIIFingest.ingest.orjson = orjson
+
+
+def gzipped(serializer):
+    return lambda req: gzip.compress(serializer(req), compresslevel=GZIP_COMPRESSLEVEL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=10000, help="assets per body")
+    parser.add_argument("--repeat", type=int, default=10, help="encodings to time")
+    args = parser.parse_args()
+
+    req = make_request(args.assets)
+    serializers = [
+        ("requests json=", requests_json),
+        ("stdlib compact", stdlib_json),
+    ]
+    if IIIFingest.ingest.orjson is not None:
+        serializers.append(("orjson", serializeJson))
+    else:
+        print("orjson is not installed; install IIIFingest[fast] to compare it")
+
+    print(f"{args.assets} assets, best of {args.repeat}")
+    print(f"{'encoding':>22} {'ms':>8} {'bytes':>11}")
+    for label, serializer in serializers:
+        for suffix, fn in (("", serializer), (" + gzip", gzipped(serializer))):
+            seconds = min(timeit.repeat(lambda: fn(req), number=1, repeat=args.repeat))
+            print(f"{label + suffix:>22} {seconds * 1e3:8.1f} {len(fn(req)):11,d}")
+
+
+if __name__ == "__main__":
+    main()
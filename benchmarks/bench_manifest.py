@@ -0,0 +1,94 @@
+"""
+Compares building a manifest dict through pyIIIFpres (createManifest, then
+json_dumps and json.loads, as Client.create_manifest does by default) with the direct
+buildManifest path and with streaming the JSON to a file with writeManifest,
+reporting wall time and peak traced memory. Canvases are generated lazily.
+
+Usage:
+    python benchmarks/bench_manifest.py [--sizes 1000 10000 50000]
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+import warnings
+
+from IIIFingest.generate_manifest import buildManifest, createManifest, writeManifest
+
+BASE_URL = "https://nrs-qa.lib.harvard.edu/URN-3:AT:BENCHMARK:MANIFEST:3"
+MANIFEST_KWARGS = dict(
+    labels=["Benchmark manifest"],
+    rights="http://creativecommons.org/licenses/by-sa/3.0/",
+    manifest_metadata=[{"label": "Creator", "value": "Unknown"}],
+)
+
+
+def make_canvases(count: int):
+    return (
+        {
+            "label": f"Image {idx}",
+            "height": 4000,
+            "width": 3000,
+            "asset_id": f"BENCH{idx}",
+            "id": f"https://mps-qa.lib.harvard.edu/assets/images/AT:BENCH{idx}",
+            "service": "/full/max/0/default.tif",
+            "format": "image/tiff",
+            "metadata": [],
+        }
+        for idx in range(count)
+    )
+
+
+def via_pyiiifpres(canvases) -> dict:
+    manifest = createManifest(base_url=BASE_URL, canvases=canvases, **MANIFEST_KWARGS)
+    return json.loads(manifest.json_dumps())
+
+
+def direct(canvases) -> dict:
+    return buildManifest(base_url=BASE_URL, canvases=canvases, **MANIFEST_KWARGS)
+
+
+def streamed(canvases) -> None:
+    with open(os.devnull, "w") as output:
+        writeManifest(output, base_url=BASE_URL, canvases=canvases, **MANIFEST_KWARGS)
+
+
+def measure(fn, size: int) -> tuple:
+    """Returns (seconds, peak traced bytes) for one call."""
+    start = time.perf_counter()
+    fn(make_canvases(size))
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn(make_canvases(size))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    print(f"{'canvases':>9} {'path':>11} {'seconds':>9} {'peak MB':>9}")
+    for size in args.sizes:
+        results = {}
+        paths = (
+            ("pyIIIFpres", via_pyiiifpres),
+            ("direct", direct),
+            ("stream", streamed),
+        )
+        for name, fn in paths:
+            results[name] = measure(fn, size)
+            seconds, peak = results[name]
+            print(f"{size:>9} {name:>11} {seconds:>9.3f} {peak / 2**20:>9.2f}")
+        speedup = results["pyIIIFpres"][0] / results["direct"][0]
+        memory = results["pyIIIFpres"][1] / results["direct"][1]
+        print(f"{size:>9} {'ratio':>11} {speedup:>8.1f}x {memory:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Measures how manifest generation scales with the number of canvases and the
+volume of per-canvas metadata, and checks the results against a baseline
+recorded on the same machine. Times and peak traced memory are recorded for:
+
+- createManifest: building the pyIIIFpres manifest object
+- client: `Client.create_manifest(fast=True)` returning the manifest dict
+- client_stream: `Client.create_manifest` streaming the JSON to a file
+
+Each measurement is the fastest of up to `--repeat` runs (stopping once the
+runs total `--min-time` seconds), and peak memory comes from a separate run
+under tracemalloc. Inputs are built before measuring.
+
+A measurement regresses if it exceeds its baseline by more than `--threshold`
+(time) or `--memory-threshold` (peak memory), as a fraction of the baseline,
+and the script then exits with status 1. Baselines depend on the machine and
+are not committed: record one with `--update-baseline` where the comparison
+will run, before making changes.
+
+Usage:
+    python benchmarks/bench_manifest_scaling.py [--sizes 100 1000 10000 100000]
+        [--paths createManifest client client_stream] [--baseline FILE]
+        [--threshold 0.25] [--memory-threshold 0.1] [--update-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+
+from IIIFingest.asset import Asset
+from IIIFingest.client import Client
+from IIIFingest.generate_manifest import createManifest
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCHMARKS_DIR, "baselines", "manifest_scaling.json")
+
+BASE_URL = "https://nrs-qa.lib.harvard.edu/URN-3:AT:BENCHMARK:MANIFEST:3"
+MANIFEST_LEVEL_METADATA = {
+    "labels": ["Benchmark manifest"],
+    "rights": "http://creativecommons.org/licenses/by-sa/3.0/",
+    "metadata": [{"label": "Creator", "value": "Unknown"}],
+}
+
+# Differences below these are treated as noise, whatever the threshold
+MIN_SECONDS_DIFFERENCE = 0.005
+MIN_BYTES_DIFFERENCE = 64 * 1024
+
+
+def make_metadata(idx: int, fields: int) -> list:
+    return [
+        {"label": f"Field {field}", "value": f"Value {field} of image {idx}"}
+        for field in range(fields)
+    ]
+
+
+def make_assets(count: int, metadata_fields: int) -> list:
+    return [
+        Asset(
+            asset_id=f"BENCH{idx}",
+            s3key=f"benchmark/image{idx}.tif",
+            format="image/tiff",
+            extension=".tif",
+            width=3000,
+            height=4000,
+            label=f"Image {idx}",
+            metadata=make_metadata(idx, metadata_fields),
+        )
+        for idx in range(count)
+    ]
+
+
+def make_client() -> Client:
+    return Client(
+        account="bench",
+        space="benchmark",
+        namespace="bench",
+        environment="qa",
+        asset_prefix="bench",
+    )
+
+
+def make_paths(client: Client) -> dict:
+    def create_manifest(assets):
+        return createManifest(
+            base_url=BASE_URL,
+            labels=MANIFEST_LEVEL_METADATA["labels"],
+            rights=MANIFEST_LEVEL_METADATA["rights"],
+            manifest_metadata=MANIFEST_LEVEL_METADATA["metadata"],
+            canvases=list(client._get_canvases(assets)),
+        )
+
+    def client_dict(assets):
+        return client.create_manifest(MANIFEST_LEVEL_METADATA, assets, fast=True)
+
+    def client_stream(assets):
+        with open(os.devnull, "w") as output:
+            return client.create_manifest(
+                MANIFEST_LEVEL_METADATA, assets, output=output
+            )
+
+    return {
+        "createManifest": create_manifest,
+        "client": client_dict,
+        "client_stream": client_stream,
+    }
+
+
+def measure(fn, assets: list, repeat: int, min_time: float) -> dict:
+    runs = []
+    while not runs or (len(runs) < repeat and sum(runs) < min_time):
+        start = time.perf_counter()
+        fn(assets)
+        runs.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(assets)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": min(runs), "runs": len(runs), "peak_bytes": peak}
+
+
+def result_key(result: dict) -> tuple:
+    return result["path"], result["canvases"], result["metadata_fields"]
+
+
+def find_regressions(
+    results: list, baseline: list, threshold: float, memory_threshold: float
+) -> list:
+    """Returns a message for each result that regressed past its baseline."""
+    baseline_results = {result_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        expected = baseline_results.get(result_key(result))
+        if expected is None:
+            continue
+        for field, limit, min_difference in (
+            ("seconds", threshold, MIN_SECONDS_DIFFERENCE),
+            ("peak_bytes", memory_threshold, MIN_BYTES_DIFFERENCE),
+        ):
+            value, base = result[field], expected[field]
+            if value > base * (1 + limit) and value - base > min_difference:
+                path, canvases, fields = result_key(result)
+                regressions.append(
+                    f"{path} with {canvases} canvases and {fields} metadata fields: "
+                    f"{field} {value:.4g} vs baseline {base:.4g} "
+                    f"(+{value / base - 1:.0%}, limit +{limit:.0%})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000]
+    )
+    parser.add_argument(
+        "--metadata-fields",
+        type=int,
+        nargs="+",
+        default=[0, 10],
+        help="metadata entries per canvas",
+    )
+    parser.add_argument(
+        "--paths",
+        nargs="+",
+        default=["createManifest", "client", "client_stream"],
+        choices=["createManifest", "client", "client_stream"],
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="maximum timed runs")
+    parser.add_argument(
+        "--min-time", type=float, default=1.0, help="stop repeating after this"
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="allowed time regression"
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=0.1,
+        help="allowed peak memory regression",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="write the results to the baseline instead of comparing",
+    )
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    paths = make_paths(make_client())
+    results = []
+    print(f"{'canvases':>9} {'fields':>6} {'path':>15} {'seconds':>9} {'peak MB':>9}")
+    for fields in args.metadata_fields:
+        for size in args.sizes:
+            assets = make_assets(size, fields)
+            for path in args.paths:
+                result = {
+                    "path": path,
+                    "canvases": size,
+                    "metadata_fields": fields,
+                    **measure(paths[path], assets, args.repeat, args.min_time),
+                }
+                results.append(result)
+                print(
+                    f"{size:>9} {fields:>6} {path:>15} {result['seconds']:>9.3f} "
+                    f"{result['peak_bytes'] / 2**20:>9.2f}"
+                )
+
+    report = {
+        "benchmark": "manifest_scaling",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as fp:
+            json.dump(report, fp, indent=2)
+            fp.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline")
+        return
+    with open(args.baseline) as fp:
+        baseline = json.load(fp)
+    if baseline.get("platform") != report["platform"]:
+        print(f"Note: baseline was recorded on {baseline.get('platform')}")
+
+    regressions = find_regressions(
+        results, baseline["results"], args.threshold, args.memory_threshold
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Measures the per-asset cost of detecting the MIME type of a file object: a new
+libmagic detector per asset (the previous behaviour), a cached detector, and
+the signature sniffer used by `Asset.from_fileobj`.
+
+Usage:
+    python benchmarks/bench_mime_sniff.py [--images DIR] [--repeat N]
+"""
+import argparse
+import io
+import os
+import timeit
+
+import magic
+
+from IIIFingest.asset import MIME_HEADER_SIZE, _get_magic, get_mime_type
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "tests", "images")
+
+
+def mime_type_new_detector(fileobj) -> str:
+    validator = magic.Magic(mime=True, uncompress=True)
+    fileobj.seek(0)
+    return validator.from_buffer(fileobj.read(MIME_HEADER_SIZE))
+
+
+def mime_type_cached_detector(fileobj) -> str:
+    fileobj.seek(0)
+    return _get_magic().from_buffer(fileobj.read(MIME_HEADER_SIZE))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", default=IMAGES_DIR, help="directory of images")
+    parser.add_argument("--repeat", type=int, default=50, help="passes per image")
+    args = parser.parse_args()
+
+    fileobjs = []
+    for name in sorted(os.listdir(args.images)):
+        with open(os.path.join(args.images, name), "rb") as fp:
+            fileobjs.append(io.BytesIO(fp.read(MIME_HEADER_SIZE)))
+
+    print(f"{len(fileobjs)} images x {args.repeat} passes")
+    for label, fn in (
+        ("new libmagic detector", mime_type_new_detector),
+        ("cached libmagic detector", mime_type_cached_detector),
+        ("signature sniffer", get_mime_type),
+    ):
+        seconds = timeit.timeit(lambda: [fn(f) for f in fileobjs], number=args.repeat)
+        per_asset = seconds / (args.repeat * len(fileobjs))
+        print(f"{label:>25}: {per_asset * 1e6:10.1f} us/asset")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Measures end-to-end throughput of the client at several batch sizes, offline:
+S3 is replaced by moto's in-process mock and the MPS ingest and jobstatus APIs
+by a local HTTP server. For each batch size, times `Client.upload` of
+synthetic TIFFs, `Client.create_manifest` and `Client.ingest` of the uploaded
+assets, and `Client.jobstatus` for as many jobs. Results are printed and
+written as JSON to `--output` so that runs of different releases can be
+compared.
+
+S3 calls do not leave the process, so upload timings cover the library's own
+work (probing, hashing, request signing and serialization), not the network.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes 10 100 1000] [--output FILE]
+"""
+import argparse
+import gzip
+import http.server
+import itertools
+import json
+import os
+import platform
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import boto3
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from moto import mock_s3
+
+import IIIFingest.ingest
+from IIIFingest.auth import Credentials
+from IIIFingest.client import Client
+
+try:
+    from importlib import metadata
+except ImportError:
+    # Python 3.7 has no importlib.metadata
+    metadata = None
+
+MANIFEST_LEVEL_METADATA = {
+    "labels": ["Benchmark manifest"],
+    "rights": "http://creativecommons.org/licenses/by-sa/3.0/",
+}
+
+
+class FakeMPSHandler(http.server.BaseHTTPRequestHandler):
+    """Answers ingest requests with a new job ID and reports jobs as running
+    for `server.job_polls` polls, then as successful."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        request = json.loads(body)
+        job_id = f"job{next(self.server.job_ids)}"
+        self.send_json(
+            {
+                "data": {
+                    "job_tracker_file": {"_id": job_id},
+                    "assets": len(request["assets"]["image"]),
+                }
+            }
+        )
+
+    def do_GET(self):
+        job_id = self.path.rstrip("/").rsplit("/", 1)[-1]
+        with self.server.lock:
+            polls = self.server.polls[job_id] = self.server.polls.get(job_id, 0) + 1
+        job_status = "running" if polls <= self.server.job_polls else "success"
+        self.send_json({"data": {"job_id": job_id, "job_status": job_status}})
+
+    def send_json(self, data: dict):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeMPSServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, job_polls: int = 0):
+        super().__init__(("127.0.0.1", 0), FakeMPSHandler)
+        self.job_polls = job_polls
+        self.job_ids = itertools.count()
+        self.polls = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self) -> "FakeMPSServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def make_tiff(width: int, height: int, size: int) -> bytes:
+    """A little-endian TIFF header with only the image size tags, padded."""
+    header = b"II*\x00" + struct.pack("<I", 8)
+    ifd = struct.pack("<H", 2)
+    ifd += struct.pack("<HHIHxx", 256, 3, 1, width)
+    ifd += struct.pack("<HHIHxx", 257, 3, 1, height)
+    ifd += struct.pack("<I", 0)
+    data = header + ifd
+    return data + bytes(max(0, size - len(data)))
+
+
+def make_images(directory: str, count: int, size: int) -> list:
+    images = []
+    for idx in range(count):
+        filepath = os.path.join(directory, f"bench{idx}.tif")
+        with open(filepath, "wb") as fp:
+            fp.write(make_tiff(3000, 4000, size))
+        images.append({"label": f"Image {idx}", "filepath": filepath, "id": str(idx)})
+    return images
+
+
+def make_client(server: FakeMPSServer) -> Client:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    boto_session = boto3.Session(
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+        region_name="us-east-1",
+    )
+    client = Client(
+        account="bench",
+        space="benchmark",
+        namespace="bench",
+        environment="dev",
+        asset_prefix="bench",
+        jwt_creds=Credentials(
+            "benchmark", "benchmarkdefault", private_key_string=pem.decode("ascii")
+        ),
+        boto_session=boto_session,
+    )
+    client.ingest_endpoint = f"{server.url}/ingest"
+    client.job_endpoint = f"{server.url}/jobstatus/"
+    boto_session.resource("s3").create_bucket(Bucket=client.bucket_name)
+    return client
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run_batch(client: Client, images: list, poll_interval: float) -> list:
+    size = len(images)
+    assets, upload_seconds = timed(lambda: client.upload(images, s3_path="bench"))
+    manifest, manifest_seconds = timed(
+        lambda: client.create_manifest(MANIFEST_LEVEL_METADATA, assets)
+    )
+    _, ingest_seconds = timed(lambda: client.ingest(assets, manifest=manifest))
+    job_ids = [f"batch{size}-{idx}" for idx in range(size)]
+    _, jobstatus_seconds = timed(
+        lambda: [
+            client.jobstatus(
+                job_id,
+                initial_interval=poll_interval,
+                interval=poll_interval,
+                backoff=1,
+                jitter=0,
+            )
+            for job_id in job_ids
+        ]
+    )
+    return [
+        {
+            "operation": operation,
+            "batch_size": size,
+            "seconds": seconds,
+            "items_per_second": size / seconds,
+        }
+        for operation, seconds in (
+            ("upload", upload_seconds),
+            ("create_manifest", manifest_seconds),
+            ("ingest", ingest_seconds),
+            ("jobstatus", jobstatus_seconds),
+        )
+    ]
+
+
+def get_version() -> str:
+    if metadata is None:
+        return "unknown"
+    try:
+        return metadata.version("IIIFingest")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument(
+        "--image-bytes", type=int, default=64 * 1024, help="size of each image"
+    )
+    parser.add_argument(
+        "--job-polls", type=int, default=0, help="polls before a job succeeds"
+    )
+    parser.add_argument(
+        "--poll-interval", type=float, default=0.001, help="seconds between polls"
+    )
+    parser.add_argument(
+        "--output", default="bench_pipeline.json", help="JSON results file"
+    )
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'assets':>7} {'operation':>16} {'seconds':>9} {'per second':>11}")
+    with tempfile.TemporaryDirectory() as directory, mock_s3(), FakeMPSServer(
+        job_polls=args.job_polls
+    ) as server:
+        images = make_images(directory, max(args.sizes), args.image_bytes)
+        client = make_client(server)
+        for size in args.sizes:
+            for result in run_batch(client, images[:size], args.poll_interval):
+                results.append(result)
+                print(
+                    f"{size:>7} {result['operation']:>16} {result['seconds']:>9.3f}"
+                    f" {result['items_per_second']:>11.1f}"
+                )
+
+    report = {
+        "benchmark": "pipeline",
+        "version": get_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "orjson": IIIFingest.ingest.orjson is not None,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "image_bytes": args.image_bytes,
+        "job_polls": args.job_polls,
+        "results": results,
+    }
+    with open(args.output, "w") as fp:
+        json.dump(report, fp, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
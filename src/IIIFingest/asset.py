@@ -2,23 +2,61 @@ from __future__ import annotations
 
 import mimetypes
 import os
-from typing import BinaryIO, Optional, TextIO, Union
+import threading
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, List, Optional, TextIO, Union
 
 import magic
 import shortuuid
 from PIL import Image
 
 from .bucket import upload_image_by_fileobj, upload_image_by_filepath
+from .executors import create_executor
+from .metrics import get_metrics
+from .probe import read_image_size, sniff_mime_type
+
+# Bytes read from the start of a file to detect its MIME type
+MIME_HEADER_SIZE = 2048
+
+# Per-thread libmagic detectors; loading the magic database is expensive and a
+# detector should not be shared between threads.
+_magic_local = threading.local()
 
 
 def get_image_size(file: Union[str, BinaryIO, TextIO]) -> tuple:
     """
     Get the image size for a given file. File can be a file path or a file-like
-    object. Returns a tuple with width and height.
+    object. Returns a tuple with width and height. TIFF, JPEG, PNG and JPEG 2000
+    dimensions are read from the file header; other formats are opened with PIL.
+    """
+    metrics = get_metrics()
+    with metrics.timer("iiifingest_probe_seconds"):
+        size = read_image_size(file)
+        if size:
+            return size
+        metrics.increment("iiifingest_probe_pil_fallbacks_total")
+        with Image.open(file) as img:
+            w, h = img.size
+            return w, h
+
+
+def _get_magic() -> magic.Magic:
+    """Returns this thread's libmagic detector, creating it on first use."""
+    detector = getattr(_magic_local, "detector", None)
+    if detector is None:
+        detector = _magic_local.detector = magic.Magic(mime=True, uncompress=True)
+    return detector
+
+
+def get_mime_type(fileobj: BinaryIO) -> str:
     """
-    with Image.open(file) as img:
-        w, h = img.size
-        return w, h
+    Get the MIME type of a file-like object from its first bytes. Common image
+    signatures are recognized directly; anything else is passed to libmagic.
+    """
+    with get_metrics().timer("iiifingest_mime_sniff_seconds"):
+        fileobj.seek(0)
+        header = fileobj.read(MIME_HEADER_SIZE)
+        return sniff_mime_type(header) or _get_magic().from_buffer(header)
 
 
 def get_filename_noext(filepath):
@@ -36,6 +74,30 @@ def create_asset_id(
     return f"{asset_prefix}{identifier}{optional_uuid}"
 
 
+@dataclass
+class AssetResult:
+    """
+    Outcome of constructing an asset with `Asset.from_files`. Exactly one of
+    `asset` or `error` is set.
+    """
+
+    filepath: str
+    asset: Optional[Asset] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _asset_from_file(cls, filepath: str, kwargs: dict) -> AssetResult:
+    """Builds one asset for `Asset.from_files`, capturing any error."""
+    try:
+        return AssetResult(filepath=filepath, asset=cls.from_file(filepath, **kwargs))
+    except Exception as e:
+        return AssetResult(filepath=filepath, error=e)
+
+
 class Asset:
     """
     Constructs an Asset to be ingested. Assets are expected to have either a
@@ -44,8 +106,24 @@ class Asset:
     asset is created with both `filepath` and `fileobj` properties, `filepath`
     will be used when uploading. If neither attribute is specified, the
     `upload()` function will fail with a `NameError`.
+
+    Assets use `__slots__` rather than a per-instance `__dict__` to keep large
+    batches compact in memory.
     """
 
+    __slots__ = (
+        "asset_id",
+        "fileobj",
+        "filepath",
+        "s3key",
+        "format",
+        "extension",
+        "width",
+        "height",
+        "label",
+        "metadata",
+    )
+
     def __init__(
         self,
         asset_id=None,
@@ -76,11 +154,19 @@ class Asset:
         self.metadata = metadata if metadata else {}
 
     def upload(
-        self, bucket_name: str = "", s3_path: Optional[str] = None, boto_session=None
+        self,
+        bucket_name: str = "",
+        s3_path: Optional[str] = None,
+        boto_session=None,
+        s3_client=None,
+        transfer_config=None,
     ) -> str:
         """
         Uploads the asset to the designated bucket. Chooses a strategy based on
-        whether the asset has a filepath or a fileobj.
+        whether the asset has a filepath or a fileobj. If `s3_client` is given
+        it is used instead of creating a new client from `boto_session`.
+        `transfer_config` sets the multipart profile used by either strategy
+        (see `bucket.create_transfer_config`).
         """
         if self.filepath:
             self.s3key = upload_image_by_filepath(
@@ -88,6 +174,8 @@ class Asset:
                 bucket_name=bucket_name,
                 s3_path=s3_path,
                 session=boto_session,
+                s3_client=s3_client,
+                transfer_config=transfer_config,
             )
         elif self.fileobj:
             self.s3key = upload_image_by_fileobj(
@@ -96,6 +184,8 @@ class Asset:
                 bucket_name=bucket_name,
                 s3_path=s3_path,
                 session=boto_session,
+                s3_client=s3_client,
+                transfer_config=transfer_config,
             )
         else:
             raise NameError("Asset has neither filepath or fileobj: {self}")
@@ -142,6 +232,42 @@ class Asset:
             metadata=metadata,
         )
 
+    @classmethod
+    def from_files(
+        cls,
+        filepaths: Iterable[str],
+        workers: Optional[int] = None,
+        executor: str = "process",
+        chunksize: Optional[int] = None,
+        **kwargs,
+    ) -> List[AssetResult]:
+        """
+        Constructs Assets from many file paths, probing them across a pool of
+        `workers` processes (or threads, with `executor="thread"`). Any kwargs
+        accepted by `from_file` are applied to every asset.
+
+        Returns an `AssetResult` per path, in input order. A file that cannot
+        be read has its exception on the result's `error` rather than being
+        raised, so one bad file does not stop the batch.
+        """
+        filepaths = list(filepaths)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if chunksize is None:
+            # Batch paths sent to each process to amortize IPC overhead
+            chunksize = max(1, len(filepaths) // (workers * 4))
+
+        with create_executor(executor, max_workers=workers) as pool:
+            return list(
+                pool.map(
+                    _asset_from_file,
+                    [cls] * len(filepaths),
+                    filepaths,
+                    [kwargs] * len(filepaths),
+                    chunksize=chunksize,
+                )
+            )
+
     @classmethod
     def from_fileobj(cls, fileobj: BinaryIO, **kwargs) -> Asset:
         """
@@ -192,11 +318,8 @@ class Asset:
             # that can be used here
             format = fileobj.content_type
         else:
-            # Get the mime type using libmagic, ensuring that the file pointer
-            # is at the top of the file.
-            validator = magic.Magic(mime=True, uncompress=True)
-            fileobj.seek(0)
-            format = validator.from_buffer(fileobj.read(2048))
+            # Get the mime type from the file signature or libmagic
+            format = get_mime_type(fileobj)
 
         if kwargs.get("extension"):
             extension = kwargs.get("extension")
@@ -239,4 +362,6 @@ class Asset:
         }
 
     def __str__(self):
-        return "Asset: " + str(sorted(self.to_dict().items()))
+        return "Asset: " + str(
+            sorted((name, getattr(self, name)) for name in self.__slots__)
+        )
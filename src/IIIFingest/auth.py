@@ -1,5 +1,7 @@
 import logging
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 
 import jwt
@@ -10,6 +12,7 @@ try:
 except ImportError:
     from backports.zoneinfo import ZoneInfo
 
+from .metrics import get_metrics
 from .settings import ROOT_DIR
 
 logger = logging.getLogger(__name__)
@@ -26,6 +29,8 @@ class Credentials:
         timezone: str = "America/New_York",
         private_key_path: str = None,
         private_key_string: str = None,
+        refresh_margin: int = 60,
+        cache_tokens: bool = True,
     ):
         """
         issuer: the service which issued the token. Example: 'atdarth'
@@ -38,6 +43,8 @@ class Credentials:
         expiration: length of time in seconds for which the token should be valid
         timezone: defaults to East Coast time
         algorithm: defaults to RS256
+        refresh_margin: cached tokens are reissued this many seconds before they expire
+        cache_tokens: reuse tokens from `make_jwt` until they are within `refresh_margin` of expiring
         """
         if not issuer:
             env_issuer = os.environ.get("LTS_IIIF_ISSUER")
@@ -96,6 +103,13 @@ class Credentials:
         self.expiration = expiration
         self.timezone = timezone
 
+        self.refresh_margin = refresh_margin
+        self.cache_tokens = cache_tokens
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._token_cache = {}
+        self._token_lock = threading.Lock()
+
     def make_jwt(
         self,
         resources: list = None,
@@ -126,8 +140,10 @@ class Credentials:
         Valid algs: RS256, ???
         Exp range: <8 hours maximum
 
+        Tokens are cached by resources, algorithm and expiration, and the
+        cached token is returned until it is within `refresh_margin` seconds
+        of expiring. Safe to call from multiple threads.
         """
-        logger.info("Making IIIF LTS jwt")
         if not resources:
             resources = self.resources
         if not algorithm:
@@ -137,6 +153,36 @@ class Credentials:
         if not timezone:
             timezone = self.timezone
 
+        if not self.cache_tokens:
+            get_metrics().increment(
+                "iiifingest_jwt_tokens_total", labels={"cache": "off"}
+            )
+            return self._encode_jwt(resources, algorithm, expiration, timezone)
+
+        key = (tuple(resources), algorithm, expiration)
+        with self._token_lock:
+            cached = self._token_cache.get(key)
+            if cached and time.monotonic() < cached[1] - self.refresh_margin:
+                self.cache_hits += 1
+                get_metrics().increment(
+                    "iiifingest_jwt_tokens_total", labels={"cache": "hit"}
+                )
+                return cached[0]
+
+            self.cache_misses += 1
+            get_metrics().increment(
+                "iiifingest_jwt_tokens_total", labels={"cache": "miss"}
+            )
+            expires_at = time.monotonic() + expiration
+            encoded_jwt = self._encode_jwt(resources, algorithm, expiration, timezone)
+            self._token_cache[key] = (encoded_jwt, expires_at)
+            return encoded_jwt
+
+    def _encode_jwt(
+        self, resources: list, algorithm: str, expiration: int, timezone: str
+    ) -> str:
+        """Signs a new JWT token."""
+        logger.info("Making IIIF LTS jwt")
         timestamp = datetime.now(ZoneInfo(timezone))
         header = {
             "typ": "JWT",
@@ -147,9 +193,10 @@ class Credentials:
         }
         payload = {"iat": timestamp, "exp": timestamp + timedelta(seconds=expiration)}
 
-        encoded_jwt = jwt.encode(
-            payload, self.private_key, algorithm=algorithm, headers=header
-        )
+        with get_metrics().timer("iiifingest_jwt_sign_seconds"):
+            encoded_jwt = jwt.encode(
+                payload, self.private_key, algorithm=algorithm, headers=header
+            )
         return encoded_jwt
 
 
@@ -3,27 +3,121 @@ import base64
 import hashlib
 import logging
 import os
-from typing import BinaryIO
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List, Optional, Tuple
 
 import boto3
 from boto3.exceptions import S3UploadFailedError
-from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 from deprecated import deprecated
+from s3transfer.utils import ChunksizeAdjuster
+
+from .executors import bounded_map, create_executor
+from .metrics import get_metrics
+from .settings import (
+    HASH_CHUNKSIZE,
+    MULTIPART_CHUNKSIZE,
+    MULTIPART_MAX_CONCURRENCY,
+    MULTIPART_THRESHOLD,
+    S3_MAX_POOL_CONNECTIONS,
+)
 
 logger = logging.getLogger(__name__)
 
 
+class S3ClientCache:
+    """
+    Caches boto3 S3 clients by session and connection pool size, so that
+    repeated uploads reuse one client and its pool of warm HTTP connections
+    instead of building a new client per call. Clients are thread-safe, and
+    creating them is serialized since boto3 sessions are not. Sessions are
+    held weakly, so a session's clients and connection pools are released once
+    the caller drops the session.
+    """
+
+    def __init__(self, max_pool_connections: int = S3_MAX_POOL_CONNECTIONS):
+        self.max_pool_connections = max_pool_connections
+        # session -> {max_pool_connections: client}
+        self._clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get_client(
+        self, session: boto3.Session = None, max_pool_connections: int = None
+    ):
+        """
+        Returns the cached S3 client for the session (the default session if
+        none is given), creating it on first use.
+        """
+        if not session:
+            session = boto3._get_default_session()
+        if max_pool_connections is None:
+            max_pool_connections = self.max_pool_connections
+        with self._lock:
+            clients = self._clients.setdefault(session, {})
+            client = clients.get(max_pool_connections)
+            if client is None:
+                client = session.client(
+                    's3', config=Config(max_pool_connections=max_pool_connections)
+                )
+                clients[max_pool_connections] = client
+        return client
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+
+# Client cache used when no client is passed to the upload functions
+_default_client_cache = S3ClientCache()
+
+
+def get_s3_client(session: boto3.Session = None):
+    """Returns a cached S3 client for the session from the default cache."""
+    return _default_client_cache.get_client(session)
+
+
+def create_transfer_config(
+    multipart_threshold: int = None,
+    part_size: int = None,
+    max_concurrency: int = None,
+    use_threads: bool = True,
+) -> TransferConfig:
+    """
+    Creates a transfer profile for S3 uploads. Files larger than
+    `multipart_threshold` bytes are uploaded in parts of `part_size` bytes,
+    with up to `max_concurrency` parts in flight per object when `use_threads`
+    is set. Unset values use the defaults from settings.
+    """
+    return TransferConfig(
+        multipart_threshold=multipart_threshold or MULTIPART_THRESHOLD,
+        multipart_chunksize=part_size or MULTIPART_CHUNKSIZE,
+        max_concurrency=max_concurrency or MULTIPART_MAX_CONCURRENCY,
+        use_threads=use_threads,
+    )
+
+
 def upload_image_by_filepath(
-    filepath: str, bucket_name: str, s3_path: str = "", session: boto3.Session = None
+    filepath: str,
+    bucket_name: str,
+    s3_path: str = "",
+    session: boto3.Session = None,
+    s3_client=None,
+    transfer_config: TransferConfig = None,
 ) -> str:
     """
-    Upload an image to S3 using a path to a file on disk.
+    Upload an image to S3 using a path to a file on disk. An existing
+    `s3_client` may be passed so that concurrent uploads share one client.
+    Multipart behaviour is controlled by `transfer_config` (see
+    `create_transfer_config`).
     """
-    # Set up boto3 session, if need be
-    if not session:
-        session = boto3._get_default_session()
-    s3 = session.resource('s3')
-    bucket = s3.Bucket(bucket_name)
+    # Reuse a cached boto3 client, if need be
+    if not s3_client:
+        s3_client = get_s3_client(session)
 
     _, file_name = os.path.split(filepath)
     # make sure s3_path ends in a slash
@@ -33,29 +127,143 @@ def upload_image_by_filepath(
     key = f"{s3_path}{file_name}" if s3_path else file_name
 
     # try to upload it
+    metrics = get_metrics()
+    labels = {"source": "filepath"}
     try:
-        bucket.upload_file(Filename=filepath, Key=key)
+        with metrics.timer("iiifingest_s3_upload_seconds", labels):
+            s3_client.upload_file(
+                Filename=filepath,
+                Bucket=bucket_name,
+                Key=key,
+                Config=transfer_config or create_transfer_config(),
+            )
+        metrics.increment("iiifingest_s3_upload_bytes_total", os.path.getsize(filepath))
+        metrics.increment("iiifingest_s3_uploads_total", labels={"result": "ok"})
         return key
 
     except S3UploadFailedError as e:
+        metrics.increment("iiifingest_s3_uploads_total", labels={"result": "error"})
         logging.error(e)
         raise e
 
 
+def _md5_base64(data) -> str:
+    """Returns the base64 encoded MD5 digest of a bytes-like object."""
+    return base64.b64encode(hashlib.md5(data).digest()).decode('utf-8')
+
+
+def md5_fileobj(fileobj: BinaryIO, chunk_size: int = None) -> str:
+    """
+    Returns the base64 encoded MD5 digest of a file object, for use as a
+    ContentMD5 header. The file is hashed from the start in chunks read into a
+    single reusable buffer, so memory use does not depend on the file size.
+    The file pointer is left at the start of the file.
+    """
+    if chunk_size is None:
+        chunk_size = HASH_CHUNKSIZE
+    metrics = get_metrics()
+    md5 = hashlib.md5()
+    hashed = 0
+    with metrics.timer("iiifingest_hash_seconds"):
+        fileobj.seek(0)
+        if hasattr(fileobj, "readinto"):
+            buffer = bytearray(chunk_size)
+            view = memoryview(buffer)
+            while True:
+                size = fileobj.readinto(buffer)
+                if not size:
+                    break
+                md5.update(view[:size])
+                hashed += size
+        else:
+            for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+                md5.update(chunk)
+                hashed += len(chunk)
+        fileobj.seek(0)
+    metrics.increment("iiifingest_hash_bytes_total", hashed)
+    return base64.b64encode(md5.digest()).decode('utf-8')
+
+
+def _get_fileobj_size(fileobj: BinaryIO) -> int:
+    """Returns the size of a seekable file object in bytes."""
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+
+def _upload_fileobj_multipart(
+    s3_client,
+    fileobj: BinaryIO,
+    bucket_name: str,
+    key: str,
+    part_size: int,
+    max_concurrency: int = 1,
+):
+    """
+    Uploads a file object as a multipart upload, reading and hashing parts as
+    they are sent so that at most `max_concurrency` parts are held in memory.
+    Each part is sent with its own ContentMD5. The upload is aborted if any
+    part fails.
+    """
+    upload_id = s3_client.create_multipart_upload(Bucket=bucket_name, Key=key)[
+        "UploadId"
+    ]
+
+    def upload_part(part_number: int, data: bytes) -> dict:
+        response = s3_client.upload_part(
+            Bucket=bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data,
+            ContentMD5=_md5_base64(data),
+        )
+        return {"ETag": response["ETag"], "PartNumber": part_number}
+
+    try:
+        fileobj.seek(0)
+        chunks = enumerate(iter(lambda: fileobj.read(part_size), b""), start=1)
+        if max_concurrency > 1:
+            with create_executor("thread", max_workers=max_concurrency) as pool:
+                parts = list(bounded_map(pool, upload_part, chunks, max_concurrency))
+        else:
+            parts = [upload_part(*chunk) for chunk in chunks]
+        s3_client.complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except Exception:
+        s3_client.abort_multipart_upload(
+            Bucket=bucket_name, Key=key, UploadId=upload_id
+        )
+        raise
+
+
 def upload_image_by_fileobj(
     fileobj: BinaryIO,
     filename: str,
     bucket_name: str,
     s3_path: str = "",
     session: boto3.Session = None,
+    s3_client=None,
+    transfer_config: TransferConfig = None,
 ) -> str:
     """
-    Upload an image to S3 using a file object in memory.
+    Upload an image to S3 using a file object in memory. An existing
+    `s3_client` may be passed so that concurrent uploads share one client.
+    Objects larger than the `transfer_config` multipart threshold are uploaded
+    in parts, so memory use is bounded by the part size and concurrency
+    rather than the file size. As with `upload_file`, the part size is raised
+    as needed to meet the S3 minimum part size and maximum part count.
     """
-    # Set up boto3 session, if need be
-    if not session:
-        session = boto3._get_default_session()
-    s3 = session.client('s3')
+    if not transfer_config:
+        transfer_config = create_transfer_config()
+    # Reuse a cached boto3 client, if need be
+    if not s3_client:
+        s3_client = get_s3_client(session)
 
     # make sure s3_path ends in a slash
     if s3_path and not s3_path.endswith("/"):
@@ -64,18 +272,38 @@ def upload_image_by_fileobj(
     # set key from path and filename
     key = f"{s3_path}{filename}" if s3_path else filename
 
-    # Get an md5 hash of the object to verify the upload
-    fileobj.seek(0)
-    digest = hashlib.md5(fileobj.read()).digest()
-    hash = base64.b64encode(digest).decode('utf-8')
-    fileobj.seek(0)
-
     # try to upload it
+    metrics = get_metrics()
+    size = _get_fileobj_size(fileobj)
     try:
-        s3.put_object(Bucket=bucket_name, Body=fileobj, ContentMD5=hash, Key=key)
+        if size > transfer_config.multipart_threshold:
+            with metrics.timer("iiifingest_s3_upload_seconds", {"source": "multipart"}):
+                _upload_fileobj_multipart(
+                    s3_client,
+                    fileobj,
+                    bucket_name,
+                    key,
+                    part_size=ChunksizeAdjuster().adjust_chunksize(
+                        transfer_config.multipart_chunksize, size
+                    ),
+                    max_concurrency=transfer_config.max_concurrency
+                    if transfer_config.use_threads
+                    else 1,
+                )
+        else:
+            # Get an md5 hash of the object to verify the upload
+            hash = md5_fileobj(fileobj)
+            with metrics.timer("iiifingest_s3_upload_seconds", {"source": "fileobj"}):
+                s3_client.put_object(
+                    Bucket=bucket_name, Body=fileobj, ContentMD5=hash, Key=key
+                )
+        metrics.increment("iiifingest_s3_upload_bytes_total", size)
+        metrics.increment("iiifingest_s3_uploads_total", labels={"result": "ok"})
         return key
-    except S3UploadFailedError as e:
-        logging.error(e)
+    except (S3UploadFailedError, BotoCoreError, ClientError) as e:
+        metrics.increment("iiifingest_s3_uploads_total", labels={"result": "error"})
+        if isinstance(e, S3UploadFailedError):
+            logging.error(e)
         raise e
 
 
@@ -89,29 +317,83 @@ def upload_image_get_metadata(
     return upload_image_by_filepath(filepath, bucket_name, s3_path, session)
 
 
-def upload_directory(path, bucket_name, s3_path="", session=None):
+@dataclass
+class UploadResult:
+    """
+    Outcome of uploading a single file with `upload_directory`. `error` holds
+    the exception raised for a failed upload, or None on success.
+    """
+
+    key: str
+    filepath: str
+    bytes: int = 0
+    duration: float = 0.0
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _walk_directory(path: str, s3_path: str) -> Iterator[Tuple[str, str]]:
+    """Yields (filepath, key) pairs for each file under `path` as it is found."""
+    for subdir, dirs, files in os.walk(path):
+        for file in files:
+            full_path = os.path.join(subdir, file)
+            relative_path = os.path.relpath(full_path, path).replace(os.sep, "/")
+            yield full_path, f"{s3_path}{relative_path}"
+
+
+def _upload_directory_file(
+    s3_client, bucket_name: str, filepath: str, key: str
+) -> UploadResult:
+    """Uploads one file for `upload_directory`, recording any error."""
+    result = UploadResult(key=key, filepath=filepath)
+    start = time.perf_counter()
+    try:
+        with open(filepath, 'rb') as data:
+            result.bytes = os.fstat(data.fileno()).st_size
+            s3_client.put_object(Bucket=bucket_name, Key=key, Body=data)
+    except (BotoCoreError, ClientError, OSError) as e:
+        logger.error(f"Failed to upload {filepath} to {key}: {e}")
+        result.error = e
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def upload_directory(
+    path: str,
+    bucket_name: str,
+    s3_path: str = "",
+    session: boto3.Session = None,
+    s3_client=None,
+    max_workers: int = 8,
+) -> List[UploadResult]:
+    """
+    Upload every file under a directory to S3, keyed by its path relative to
+    the directory. Files are fed from the directory walk into a pool of
+    `max_workers` threads as they are found. A failed file does not stop the
+    others; returns an `UploadResult` per file in walk order.
+    """
     if s3_path and not s3_path.endswith("/"):
         s3_path += "/"
-    if not session:
-        session = boto3._get_default_session()
-    s3 = session.resource('s3')
-    bucket = s3.Bucket(bucket_name)
-    try:
-        for subdir, dirs, files in os.walk(path):
-            for file in files:
-                full_path = os.path.join(subdir, file)
-                with open(full_path, 'rb') as data:
-                    bucket_file_path = full_path[len(path) + 1 :]
-                    bucket.put_object(
-                        Key=f"{s3_path}{bucket_file_path}"
-                        if s3_path
-                        else bucket_file_path,
-                        Body=data,
-                    )
-        return True
-    except ClientError as e:
-        logging.error(e)
-        raise e
+    if not s3_client:
+        s3_client = get_s3_client(session)
+
+    def upload_file(filepath: str, key: str) -> UploadResult:
+        return _upload_directory_file(s3_client, bucket_name, filepath, key)
+
+    with create_executor("thread", max_workers=max_workers) as pool:
+        results = list(
+            bounded_map(
+                pool, upload_file, _walk_directory(path, s3_path), 2 * max_workers
+            )
+        )
+
+    failed = sum(1 for result in results if not result.ok)
+    if failed:
+        logger.warning(f"{failed} of {len(results)} files failed to upload")
+    return results
 
 
 if __name__ == "__main__":
@@ -126,7 +408,10 @@ if __name__ == "__main__":
         print("Please set a bucket which you can use in the current AWS session")
 
     if args.dir and args.bucket:
-        upload_directory(args.dir, args.bucket)
+        for result in upload_directory(
+            args.dir, args.bucket, s3_path=args.s3path or ""
+        ):
+            print(result)
 
     if args.file and args.bucket:
         response = upload_image_by_filepath(args.file, args.bucket, s3_path=args.s3path)
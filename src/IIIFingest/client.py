@@ -2,15 +2,45 @@ import json
 import logging
 import os
 import re
-from typing import List, Optional
+import threading
+import time
+from contextlib import nullcontext
+from typing import IO, Callable, Iterable, Iterator, List, Optional, Tuple, Union
 
-import requests
+import boto3
 import shortuuid
 
 from .asset import Asset, create_asset_id
-from .generate_manifest import createManifest
-from .ingest import createImageAsset, pingJob, sendIngestRequest, wrapIngestRequest
+from .bucket import S3ClientCache
+from .executors import create_executor
+from .generate_manifest import (
+    buildManifest,
+    createManifest,
+    updateManifest,
+    validateManifest,
+    writeManifest,
+)
+from .ingest import (
+    JobMonitor,
+    JobUpdate,
+    chunkIngestAssets,
+    create_http_session,
+    createImageAsset,
+    iterJobStatus,
+    pingJob,
+    sendIngestRequest,
+    serializeJson,
+    wrapIngestRequest,
+)
+from .metrics import get_metrics
+from .pipeline import Pipeline, PipelineResult, StageStats
 from .settings import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_POOL_MAXSIZE,
+    HTTP_READ_TIMEOUT,
+    INGEST_CHUNK_ASSETS,
+    INGEST_CHUNK_BYTES,
+    INGEST_WORKERS,
     MPS_ASSET_BASE_URL,
     MPS_ASSET_BASE_URL_PROD,
     MPS_BUCKET_NAME,
@@ -25,12 +55,138 @@ from .settings import (
     MPS_MANIFEST_BASE_URL_PROD,
     MPS_PROD_INGEST_SERVICE_STATUS,
     MPS_QA_INGEST_SERVICE_STATUS,
+    PIPELINE_PROBE_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+    S3_MAX_POOL_CONNECTIONS,
     VALID_ENVIRONMENTS,
+    VALID_EXECUTORS,
 )
+from .tracing import TraceWriter, open_trace
 
 logger = logging.getLogger(__name__)
 nrs_namespace_invalid = re.compile(r"[^a-zA-Z0-9\.]")
 
+# S3 client for upload worker processes, set by _init_upload_process
+_process_s3_client = None
+
+
+def _get_session_kwargs(boto_session=None) -> dict:
+    """
+    Returns the picklable parts of a boto3 session (credentials and region) so
+    that an equivalent session can be rebuilt in a worker process.
+    """
+    if not boto_session:
+        boto_session = boto3._get_default_session()
+    kwargs = {"region_name": boto_session.region_name}
+    credentials = boto_session.get_credentials()
+    if credentials:
+        frozen = credentials.get_frozen_credentials()
+        kwargs.update(
+            aws_access_key_id=frozen.access_key,
+            aws_secret_access_key=frozen.secret_key,
+            aws_session_token=frozen.token,
+        )
+    return kwargs
+
+
+def _init_upload_process(session_kwargs: dict, max_pool_connections: int):
+    """Creates the S3 client shared by all uploads in a worker process."""
+    global _process_s3_client
+    _process_s3_client = S3ClientCache(max_pool_connections).get_client(
+        boto3.Session(**session_kwargs)
+    )
+
+
+def _upload_image(
+    image: dict,
+    asset_id: str,
+    bucket_name: str,
+    s3_path: str,
+    s3_client=None,
+    transfer_config=None,
+) -> Asset:
+    """
+    Probes a single image dict and uploads it, returning the uploaded asset.
+    """
+    return _upload_image_traced(
+        image, asset_id, bucket_name, s3_path, s3_client, transfer_config
+    )[0]
+
+
+def _probe_image(image: dict, asset_id: str) -> Asset:
+    """Creates the asset for an image dict, reading its format and size."""
+    if "filepath" in image:
+        return Asset.from_file(
+            image["filepath"], asset_id=asset_id, label=image.get("label")
+        )
+    elif "fileobj" in image:
+        return Asset.from_fileobj(
+            image["fileobj"], asset_id=asset_id, label=image.get("label")
+        )
+
+
+def _get_image_bytes(image: dict) -> Optional[int]:
+    if "filepath" in image:
+        return os.path.getsize(image["filepath"])
+    fileobj = image["fileobj"]
+    if hasattr(fileobj, "size"):
+        return fileobj.size
+    position = fileobj.tell()
+    size = fileobj.seek(0, os.SEEK_END)
+    fileobj.seek(position)
+    return size
+
+
+def _upload_image_traced(
+    image: dict,
+    asset_id: str,
+    bucket_name: str,
+    s3_path: str,
+    s3_client=None,
+    transfer_config=None,
+) -> Tuple[Asset, dict]:
+    """
+    Probes a single image dict and uploads it. Returns the uploaded asset and
+    its trace record, with the start and end times of each stage. If either
+    stage fails, the exception is raised with a `trace_record` attribute
+    holding the times up to the failure and the `error`.
+    """
+    probe_start = time.time()
+    upload_start = None
+    try:
+        asset = _probe_image(image, asset_id)
+        upload_start = time.time()
+        asset.upload(
+            bucket_name=bucket_name,
+            s3_path=s3_path,
+            s3_client=s3_client or _process_s3_client,
+            transfer_config=transfer_config,
+        )
+    except Exception as e:
+        failed = time.time()
+        e.trace_record = {
+            "event": "upload",
+            "asset_id": asset_id,
+            "s3key": None,
+            "probe_start": probe_start,
+            "probe_end": upload_start or failed,
+            "error": repr(e),
+        }
+        if upload_start is not None:
+            e.trace_record.update(upload_start=upload_start, upload_end=failed)
+        raise
+    record = {
+        "event": "upload",
+        "asset_id": asset.asset_id,
+        "s3key": asset.s3key,
+        "bytes": _get_image_bytes(image),
+        "probe_start": probe_start,
+        "probe_end": upload_start,
+        "upload_start": upload_start,
+        "upload_end": time.time(),
+    }
+    return asset, record
+
 
 class Client:
     """
@@ -48,6 +204,19 @@ class Client:
         jwt_creds=None,
         boto_session=None,
         with_uuid: bool = True,
+        upload_workers: int = 8,
+        upload_executor: str = "thread",
+        transfer_config=None,
+        max_pool_connections: int = S3_MAX_POOL_CONNECTIONS,
+        http_session=None,
+        http_pool_maxsize: int = HTTP_POOL_MAXSIZE,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+        ingest_chunk_assets: int = INGEST_CHUNK_ASSETS,
+        ingest_chunk_bytes: int = INGEST_CHUNK_BYTES,
+        ingest_workers: int = INGEST_WORKERS,
+        ingest_serializer: Optional[Callable[[dict], bytes]] = None,
+        ingest_gzip_threshold: Optional[int] = None,
     ):
         if not namespace or nrs_namespace_invalid.search(namespace):
             raise ValueError("Invalid or missing namespace_prefix")
@@ -55,6 +224,10 @@ class Client:
             raise ValueError(
                 f"Invalid environment: {environment} must be one of: {VALID_ENVIRONMENTS}"
             )
+        if upload_executor not in VALID_EXECUTORS:
+            raise ValueError(
+                f"Invalid upload_executor: {upload_executor} must be one of: {VALID_EXECUTORS}"
+            )
 
         namespace = namespace.upper()
 
@@ -67,6 +240,19 @@ class Client:
         self.jwt_creds = jwt_creds
         self.boto_session = boto_session
         self.with_uuid = with_uuid
+        self.upload_workers = upload_workers
+        self.upload_executor = upload_executor
+        self.transfer_config = transfer_config
+        self.s3_clients = S3ClientCache(max_pool_connections=max_pool_connections)
+        self.http_session = http_session or create_http_session(
+            pool_maxsize=http_pool_maxsize
+        )
+        self.timeout = (connect_timeout, read_timeout)
+        self.ingest_chunk_assets = ingest_chunk_assets
+        self.ingest_chunk_bytes = ingest_chunk_bytes
+        self.ingest_workers = ingest_workers
+        self.ingest_serializer = ingest_serializer
+        self.ingest_gzip_threshold = ingest_gzip_threshold
 
         self.bucket_name = MPS_BUCKET_NAME.format(
             account=account, space=space, environment=environment
@@ -114,12 +300,35 @@ class Client:
         """Constructs the manifest URL."""
         return f"{self.manifest_base_url}{manifest_name}:MANIFEST:{prezi_version}"
 
+    def _get_asset_id(self, image: dict, with_uuid: bool) -> str:
+        """Returns the image's `asset_id`, or creates one from its `id`."""
+        if image.get("asset_id"):
+            return image.get("asset_id")
+        return create_asset_id(
+            asset_prefix=self.asset_prefix,
+            identifier=image.get("id"),
+            with_uuid=with_uuid,
+        )
+
     def upload(
-        self, images: List[dict], s3_path: str = "", with_uuid=None
+        self,
+        images: List[dict],
+        s3_path: str = "",
+        with_uuid=None,
+        max_workers: Optional[int] = None,
+        trace: Optional[Union[str, os.PathLike, TraceWriter]] = None,
     ) -> List[Asset]:
         """
         Uploads a list of images to the MPS ingest bucket in S3.
-        Returns a list of assets.
+        Returns a list of assets in the same order as the images.
+        Images are probed and uploaded concurrently by a pool of up to
+        `max_workers` workers (defaults to the client's `upload_workers`),
+        all sharing one S3 client. With the "process" executor, only images
+        with a filepath are supported.
+        If `trace` (a path or `TraceWriter`) is given, a record with the probe
+        and upload times of each asset is appended to it as JSON Lines; an
+        asset whose upload fails gets a record with the `error` before the
+        exception is raised.
         image dict format
         {
             "id": "id123",
@@ -131,64 +340,124 @@ class Client:
         """
         if with_uuid is None:
             with_uuid = self.with_uuid
+        if max_workers is None:
+            max_workers = self.upload_workers
         logger.debug(f"Uploading {len(images)} images")
-        assets = []
-        for image in images:
-            if image.get("asset_id"):
-                asset_id = image.get("asset_id")
-            else:
-                asset_id = create_asset_id(
-                    asset_prefix=self.asset_prefix,
-                    identifier=image.get("id"),
-                    with_uuid=with_uuid,
-                )
 
-            if "filepath" in image:
-                filepath = image["filepath"]
-                asset = Asset.from_file(
-                    filepath, asset_id=asset_id, label=image.get("label")
-                )
-            elif "fileobj" in image:
-                fileobj = image["fileobj"]
-                asset = Asset.from_fileobj(
-                    fileobj, asset_id=asset_id, label=image.get("label")
+        asset_ids = [self._get_asset_id(image, with_uuid) for image in images]
+
+        upload_args = dict(
+            bucket_name=self.bucket_name,
+            s3_path=s3_path,
+            transfer_config=self.transfer_config,
+        )
+        if self.upload_executor == "process":
+            if any("filepath" not in image for image in images):
+                raise ValueError(
+                    "The process upload executor only supports images with a filepath"
                 )
-            asset.upload(
-                bucket_name=self.bucket_name,
-                s3_path=s3_path,
-                boto_session=self.boto_session,
+            pool = create_executor(
+                "process",
+                max_workers=max_workers,
+                initializer=_init_upload_process,
+                initargs=(
+                    _get_session_kwargs(self.boto_session),
+                    self.s3_clients.max_pool_connections,
+                ),
             )
-            assets.append(asset)
+        else:
+            upload_args["s3_client"] = self.s3_clients.get_client(self.boto_session)
+            if max_workers == 1 or len(images) <= 1:
+                pool = None
+            else:
+                pool = create_executor("thread", max_workers=max_workers)
+
+        upload_image = _upload_image if trace is None else _upload_image_traced
+        assets = []
+        with open_trace(trace) as writer, pool or nullcontext():
+            if pool is None:
+                results = (
+                    upload_image(image, asset_id, **upload_args)
+                    for image, asset_id in zip(images, asset_ids)
+                )
+            else:
+                futures = [
+                    pool.submit(upload_image, image, asset_id, **upload_args)
+                    for image, asset_id in zip(images, asset_ids)
+                ]
+                results = (future.result() for future in futures)
+            try:
+                for result in results:
+                    if writer is not None:
+                        result, record = result
+                        writer.write(record)
+                    assets.append(result)
+            except Exception as e:
+                # Record the failed asset before giving up on the batch
+                if writer is not None and hasattr(e, "trace_record"):
+                    writer.write(e.trace_record)
+                raise
         logger.debug(f"Upload completed. Returning assets: {assets}")
         return assets
 
+    def _get_canvases(self, assets: Iterable[Asset]) -> Iterator[dict]:
+        """
+        Yields the canvas data for each asset. Canvases are produced one at a
+        time, with only the fields used by the manifest, so that a large batch
+        of assets is never copied into a list of dicts.
+        """
+        for asset in assets:
+            yield {
+                "asset_id": asset.asset_id,
+                "id": self._get_asset_url(asset.asset_id),
+                "service": f"/full/max/0/default{asset.extension}",
+                "format": asset.format,
+                "width": asset.width,
+                "height": asset.height,
+                "label": asset.label,
+                "metadata": asset.metadata,
+            }
+
     def create_manifest(
         self,
         manifest_level_metadata: dict,
         assets: List[Asset],
         manifest_name: str = "",
         prezi_version: int = 3,
+        fast: bool = False,
+        output: Optional[Union[str, os.PathLike, IO]] = None,
+        validate: bool = False,
     ) -> dict:
         """
         Creates a manifest from manifest level metadata and a list of image assets.
         Returns the created manifest as a dict.
+        By default the manifest is built and serialized through pyIIIFpres,
+        which checks the values (rights URL, language tags, behaviors) as they
+        are set. Pass `fast=True` to build the dict directly with
+        `buildManifest` instead, skipping those checks; for valid input both
+        produce the same manifest.
+
+        If `output` (a file path or file object) is given, the manifest JSON is
+        streamed to it one canvas at a time with `writeManifest` instead,
+        without the pyIIIFpres checks, and `assets` may be any iterable.
+        Returns a dict with the manifest `id` and the number of `canvases`
+        written.
+
+        With `validate`, the manifest dict is checked against the IIIF schema
+        with `validateManifest`, raising a `jsonschema.ValidationError` if it is
+        invalid. This is not supported together with `output`.
         """
+        if validate and output is not None:
+            raise ValueError("validate is not supported when streaming to output")
         if not manifest_name:
             manifest_name = f"GEN{shortuuid.uuid()}"
 
-        canvases = []
-        for asset in assets:
-            canvas = asset.to_dict()
-            canvas["id"] = self._get_asset_url(asset.asset_id)
-            canvas["service"] = f"/full/max/0/default{asset.extension}"
-            canvases.append(canvas)
-
         logger.debug(f"Creating manifest from data: {manifest_level_metadata}")
         manifest_kwargs = dict(
             base_url=self._get_manifest_url(
                 manifest_name=manifest_name, prezi_version=prezi_version
             ),
-            canvases=canvases,
+            canvases=self._get_canvases(assets),
             labels=manifest_level_metadata.get("labels", None),
             behaviors=manifest_level_metadata.get("behaviors", None),
             providers=manifest_level_metadata.get("providers", None),
@@ -205,58 +474,66 @@ class Client:
                 "service_profile", None
             ),  # need to add this
         )
-        manifest = createManifest(
-            **{k: v for k, v in manifest_kwargs.items() if v is not None}
-        )
-        manifest_json = manifest.json_dumps()
-        logger.debug(f"Created manifest: {manifest_json}")
+        manifest_kwargs = {k: v for k, v in manifest_kwargs.items() if v is not None}
+        metrics = get_metrics()
+        if output is not None:
+            with metrics.timer("iiifingest_manifest_build_seconds", {"mode": "stream"}):
+                count = writeManifest(output, **manifest_kwargs)
+            logger.debug(
+                f"Wrote manifest {manifest_kwargs['base_url']} with {count} canvases"
+            )
+            return {"id": manifest_kwargs["base_url"], "canvases": count}
 
-        manifest_dict = json.loads(manifest_json)
+        if fast:
+            with metrics.timer("iiifingest_manifest_build_seconds", {"mode": "fast"}):
+                manifest_dict = buildManifest(**manifest_kwargs)
+            logger.debug(
+                f"Created manifest {manifest_dict['id']} with {len(manifest_dict['items'])} canvases"
+            )
+        else:
+            labels = {"mode": "pyiiifpres"}
+            with metrics.timer("iiifingest_manifest_build_seconds", labels):
+                manifest = createManifest(**manifest_kwargs)
+                manifest_json = manifest.json_dumps()
+                manifest_dict = json.loads(manifest_json)
+            logger.debug(f"Created manifest: {manifest_json}")
+
+        if validate:
+            with metrics.timer("iiifingest_manifest_validate_seconds"):
+                validateManifest(manifest_dict)
         return manifest_dict
 
-    def ingest(
+    def update_manifest(
         self,
-        assets: List[Asset],
-        manifest: Optional[dict] = None,
-        policy_definition: Optional[dict] = None,
+        manifest: dict,
+        assets: Iterable[Asset] = (),
+        remove: Iterable[str] = (),
+        manifest_level_metadata: Optional[dict] = None,
     ) -> dict:
         """
-        Sends ingest request for assets and manifest.
-        Returns the job ID.
+        Updates a manifest dict created with `create_manifest` in place: the
+        canvas for each of `assets` replaces the canvas with the same asset ID,
+        or is appended if there is none, and the canvases for the asset IDs in
+        `remove` are dropped. Only the affected canvases are built, so adding a
+        few pages to a large manifest does not rebuild it.
+        `manifest_level_metadata` supplies `default_lang`, `service_type` and
+        `service_profile`, as for `create_manifest`.
+        Returns the number of canvases `added`, `replaced` and `removed`.
         """
-        if manifest is None:
-            manifest = {}
-
-        logger.debug(f"Preparing {len(assets)} ingest assets")
-        ingest_assets = []
-        for asset in assets:
-            src_path, src_key = os.path.split(asset.s3key)
-            params = {
-                "space": self.space,
-                "createdByAgent": self.agent,
-                "identifier": f"{self.namespace}:{asset.asset_id}",
-                "storageSrcPath": f"{src_path}/",
-                "storageSrcKey": src_key,
-                "policyDefinition": policy_definition,
-                "assetMetadata": [
-                    {
-                        "fieldName": "imageSize",
-                        "jsonValue": {
-                            "width": asset.width,
-                            "height": asset.height,
-                        },
-                    }
-                ],
-            }
-            ingest_asset = createImageAsset(
-                **{k: v for k, v in params.items() if v is not None}
-            )
-            ingest_assets.append(ingest_asset)
-
-        token = self.jwt_creds.make_jwt()
-        logger.debug(f"Generated ingest auth token: {token}")
+        options = {
+            k: v
+            for k, v in (manifest_level_metadata or {}).items()
+            if k in ("default_lang", "service_type", "service_profile")
+        }
+        result = updateManifest(
+            manifest, canvases=self._get_canvases(assets), remove=remove, **options
+        )
+        logger.debug(f"Updated manifest {manifest['id']}: {result}")
+        return result
 
-        request_body = wrapIngestRequest(
+    def _wrap_ingest_request(self, ingest_assets: List[dict], manifest: dict) -> dict:
+        """Returns the ingest request for the given ingest assets and manifest."""
+        return wrapIngestRequest(
             assets=ingest_assets,
             manifest=manifest,
             metadata={},
@@ -264,11 +541,31 @@ class Client:
             action_default="upsert",
         )
 
-        logger.debug(f"Sending ingest request: {request_body}")
+    def _send_ingest_request(
+        self,
+        ingest_assets: List[dict],
+        manifest: dict,
+        token: str,
+        serialized: Optional[bytes] = None,
+    ) -> dict:
+        """
+        Sends one ingest request for the given ingest assets and manifest,
+        using `serialized` as its body if the request is already serialized.
+        Returns the job ID, error and data from the response.
+        """
+        request_body = self._wrap_ingest_request(ingest_assets, manifest)
+
+        # Formatted only if debug logging is on, as the request may be large
+        logger.debug("Sending ingest request: %s", request_body)
         response = sendIngestRequest(
             req=request_body,
             endpoint=self.ingest_endpoint,
             token=token,
+            session=self.http_session,
+            timeout=self.timeout,
+            serializer=self.ingest_serializer,
+            gzip_threshold=self.ingest_gzip_threshold,
+            serialized=serialized,
         )
         logger.debug(
             f"Received ingest response: {response.status_code} {response.text}"
@@ -283,21 +580,195 @@ class Client:
         else:
             logger.info(f"Ingest job ID: {job_id}")
 
-        result = {
+        return {
             "job_id": str(job_id),
             "error": response_data.get("error", None),
             "data": response_data.get("data", {}),
         }
-        return result
 
-    def jobstatus(self, job_id: str) -> dict:
+    def ingest(
+        self,
+        assets: List[Asset],
+        manifest: Optional[dict] = None,
+        policy_definition: Optional[dict] = None,
+        max_workers: Optional[int] = None,
+        trace: Optional[Union[str, os.PathLike, TraceWriter]] = None,
+    ) -> dict:
+        """
+        Sends ingest request for assets and manifest.
+        Returns the job ID.
+
+        Large batches are split into several requests of at most
+        `ingest_chunk_assets` assets and about `ingest_chunk_bytes` of JSON.
+        All but the last are sent concurrently, up to `max_workers` (default
+        `ingest_workers`) at a time; the last request carries the manifest and
+        is sent only if none of the others returned an error. An exception
+        raised while sending one of several requests is recorded as that
+        request's `error` instead of being raised. `job_id`, `error` and
+        `data` are those of that final request (or the first `error` of any
+        request), `job_ids` lists the job IDs of every request in order ("" if
+        the request failed or was not sent), and `chunks` holds each request's
+        own result.
+        If `trace` (a path or `TraceWriter`) is given, a record with the start
+        and end times and job ID of the request that included each asset is
+        appended to it as JSON Lines.
+        """
+        logger.debug(f"Preparing {len(assets)} ingest assets")
+        ingest_assets = [
+            self._create_ingest_asset(asset, policy_definition) for asset in assets
+        ]
+        return self._send_ingest(assets, ingest_assets, manifest, max_workers, trace)
+
+    def _create_ingest_asset(
+        self, asset: Asset, policy_definition: Optional[dict] = None
+    ) -> dict:
+        """Returns the ingest request entry for an uploaded asset."""
+        src_path, src_key = os.path.split(asset.s3key)
+        params = {
+            "space": self.space,
+            "createdByAgent": self.agent,
+            "identifier": f"{self.namespace}:{asset.asset_id}",
+            "storageSrcPath": f"{src_path}/",
+            "storageSrcKey": src_key,
+            "policyDefinition": policy_definition,
+            "assetMetadata": [
+                {
+                    "fieldName": "imageSize",
+                    "jsonValue": {
+                        "width": asset.width,
+                        "height": asset.height,
+                    },
+                }
+            ],
+        }
+        return createImageAsset(**{k: v for k, v in params.items() if v is not None})
+
+    def _send_ingest(
+        self,
+        assets: List[Asset],
+        ingest_assets: List[dict],
+        manifest: Optional[dict] = None,
+        max_workers: Optional[int] = None,
+        trace: Optional[Union[str, os.PathLike, TraceWriter]] = None,
+    ) -> dict:
+        """
+        Sends the ingest requests for `ingest_assets`, the entries for
+        `assets`, as described in `ingest`.
+        """
+        if manifest is None:
+            manifest = {}
+
+        token = self.jwt_creds.make_jwt()
+        logger.debug(f"Generated ingest auth token: {token}")
+
+        # When the assets fit in one request by count, serialize that request
+        # once: its size decides whether it must be split, and the body is sent
+        # as is if it fits
+        serializer = self.ingest_serializer or serializeJson
+        serialized = None
+        if len(ingest_assets) <= self.ingest_chunk_assets:
+            serialized = serializer(self._wrap_ingest_request(ingest_assets, manifest))
+            if len(serialized) > self.ingest_chunk_bytes:
+                serialized = None
+        if serialized is not None:
+            chunks = [ingest_assets]
+        else:
+            chunks = chunkIngestAssets(
+                ingest_assets,
+                max_assets=self.ingest_chunk_assets,
+                max_bytes=self.ingest_chunk_bytes,
+                reserved_bytes=len(serializer(manifest)) if manifest else 0,
+                serializer=serializer,
+            )
+        if len(chunks) > 1:
+            logger.debug(f"Splitting ingest into {len(chunks)} requests")
+
+        # Assets keep their order across chunks, so each chunk's assets follow
+        # from the chunk sizes
+        chunk_assets = []
+        offset = 0
+        for chunk in chunks:
+            chunk_assets.append(assets[offset : offset + len(chunk)])
+            offset += len(chunk)
+
+        with open_trace(trace) as writer:
+
+            def send(
+                chunk: List[dict],
+                chunk_assets: List[Asset],
+                manifest: dict,
+                serialized: Optional[bytes] = None,
+            ):
+                ingest_start = time.time()
+                try:
+                    result = self._send_ingest_request(
+                        chunk, manifest, token, serialized
+                    )
+                except Exception as e:
+                    # Keep the results of the other requests
+                    if len(chunks) == 1:
+                        raise
+                    logger.warning(f"Ingest request failed: {e!r}")
+                    result = {"job_id": "", "error": repr(e), "data": {}}
+                if writer is not None:
+                    ingest_end = time.time()
+                    for asset in chunk_assets:
+                        writer.write(
+                            {
+                                "event": "ingest",
+                                "asset_id": asset.asset_id,
+                                "s3key": asset.s3key,
+                                "job_id": result["job_id"],
+                                "ingest_start": ingest_start,
+                                "ingest_end": ingest_end,
+                            }
+                        )
+                return result
+
+            results = []
+            if len(chunks) > 1:
+                workers = min(max_workers or self.ingest_workers, len(chunks) - 1)
+                with create_executor("thread", max_workers=workers) as pool:
+                    results = list(
+                        pool.map(
+                            lambda args: send(*args, {}),
+                            zip(chunks[:-1], chunk_assets[:-1]),
+                        )
+                    )
+            if any(r["error"] is not None for r in results):
+                logger.warning("Not sending the manifest after a failed request")
+                results.append(
+                    {
+                        "job_id": "",
+                        "error": "Not sent after an earlier request failed",
+                        "data": {},
+                    }
+                )
+            else:
+                results.append(send(chunks[-1], chunk_assets[-1], manifest, serialized))
+
+        errors = [r["error"] for r in results if r["error"] is not None]
+        return {
+            "job_id": results[-1]["job_id"],
+            "error": errors[0] if errors else None,
+            "data": results[-1]["data"],
+            "job_ids": [r["job_id"] for r in results],
+            "chunks": results,
+        }
+
+    def jobstatus(self, job_id: str, **kwargs) -> dict:
         """
         Returns the status of an ingest request.
+        Polls until the job finishes; keyword arguments (e.g. `deadline`,
+        `interval`, `backoff`) are passed to `pingJob`.
         """
         logger.info(f"Pinging job {job_id}")
         status = pingJob(
             job_id=job_id,
             endpoint=self.job_endpoint,
+            session=self.http_session,
+            timeout=self.timeout,
+            **kwargs,
         )
         logger.info(f"Job status: {status}")
 
@@ -308,12 +779,152 @@ class Client:
 
         return status
 
+    def iter_jobstatus(self, job_id: str, **kwargs) -> Iterator[JobUpdate]:
+        """
+        Yields a `JobUpdate` each time the status of an ingest request changes,
+        ending with the final update. Keyword arguments are passed to
+        `iterJobStatus`.
+        """
+        return iterJobStatus(
+            job_id,
+            endpoint=self.job_endpoint,
+            session=self.http_session,
+            timeout=self.timeout,
+            **kwargs,
+        )
+
+    def monitor_jobs(self, job_ids: Iterable[str] = (), **kwargs) -> JobMonitor:
+        """
+        Returns a `JobMonitor` tracking the given ingest jobs through this
+        client's job status endpoint and HTTP session. Keyword arguments
+        (e.g. `interval`, `max_pings`, `on_complete`) are passed to
+        `JobMonitor`. Call `run()` on the monitor, or iterate its `updates()`.
+        """
+        monitor = JobMonitor(
+            endpoint=self.job_endpoint,
+            session=self.http_session,
+            timeout=self.timeout,
+            **kwargs,
+        )
+        for job_id in job_ids:
+            monitor.add(job_id)
+        return monitor
+
+    def run_pipeline(
+        self,
+        images: Iterable[dict],
+        manifest_level_metadata: dict,
+        s3_path: str = "",
+        with_uuid=None,
+        manifest_name: str = "",
+        policy_definition: Optional[dict] = None,
+        probe_workers: int = PIPELINE_PROBE_WORKERS,
+        upload_workers: Optional[int] = None,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        wait: bool = False,
+        cancel: Optional[threading.Event] = None,
+    ) -> PipelineResult:
+        """
+        Uploads images, creates their manifest and ingests them, overlapping
+        the per-image stages: images are probed by `probe_workers` threads,
+        uploaded by `upload_workers` threads (defaults to the client's
+        `upload_workers`) and turned into ingest request entries as they
+        arrive, with at most `queue_size` items waiting between two stages.
+        `images` may be any iterable and is consumed as the pipeline runs.
+        Once every image is uploaded, the manifest is built and the ingest
+        requests sent as by `create_manifest` and `ingest`. With `wait`, the
+        ingest jobs are then polled until they finish.
+
+        Setting the `cancel` event stops taking new images: those already taken
+        finish uploading and are returned in `assets`, and the remaining steps
+        are skipped; the result then has `cancelled` set.
+        An error in any stage stops the run and is raised. Returns a
+        `PipelineResult`, whose `stages` hold the items, time and throughput of
+        each stage. Uploads always use threads, whatever the `upload_executor`.
+        """
+        if with_uuid is None:
+            with_uuid = self.with_uuid
+        if upload_workers is None:
+            upload_workers = self.upload_workers
+        s3_client = self.s3_clients.get_client(self.boto_session)
+
+        def probe(item):
+            idx, image = item
+            return idx, _probe_image(image, self._get_asset_id(image, with_uuid))
+
+        def upload(item):
+            idx, asset = item
+            asset.upload(
+                bucket_name=self.bucket_name,
+                s3_path=s3_path,
+                s3_client=s3_client,
+                transfer_config=self.transfer_config,
+            )
+            return idx, asset
+
+        def assemble(item):
+            idx, asset = item
+            return idx, asset, self._create_ingest_asset(asset, policy_definition)
+
+        pipeline = Pipeline(cancel=cancel, queue_size=queue_size)
+        result = PipelineResult(stages=pipeline.stages)
+        items = pipeline.feed(enumerate(images))
+        items = pipeline.stage("probe", probe, items, workers=probe_workers)
+        items = pipeline.stage("upload", upload, items, workers=upload_workers)
+        items = pipeline.stage("assemble", assemble, items)
+        try:
+            uploaded = sorted(pipeline.results(items), key=lambda item: item[0])
+        finally:
+            pipeline.join()
+        result.assets = [asset for _, asset, _ in uploaded]
+        logger.debug(f"Pipeline uploaded {len(result.assets)} assets")
+
+        def run_step(name: str, fn: Callable, items: int):
+            stats = result.stages[name] = StageStats(name=name)
+            started = time.perf_counter()
+            value = fn()
+            stats.add(started, time.perf_counter(), items=items)
+            return value
+
+        if not pipeline.cancel.is_set():
+            result.manifest = run_step(
+                "manifest",
+                lambda: self.create_manifest(
+                    manifest_level_metadata, result.assets, manifest_name
+                ),
+                len(result.assets),
+            )
+        if not pipeline.cancel.is_set():
+            ingest_assets = [ingest_asset for _, _, ingest_asset in uploaded]
+            result.ingest = run_step(
+                "ingest",
+                lambda: self._send_ingest(
+                    result.assets, ingest_assets, result.manifest
+                ),
+                len(result.assets),
+            )
+        if wait and not pipeline.cancel.is_set():
+            job_ids = result.ingest["job_ids"]
+            result.jobs = run_step(
+                "jobstatus", self.monitor_jobs(job_ids).run, len(job_ids)
+            )
+        result.cancelled = pipeline.cancel.is_set()
+
+        for stats in result.stages.values():
+            logger.info(
+                f"Pipeline stage {stats.name}: {stats.items} items in "
+                f"{stats.seconds:.3f}s ({stats.throughput:.1f}/s)"
+            )
+        return result
+
     def servicestatus(self) -> bool:
         """
         Returns whether the MPS ingest service is up or down
         """
         logger.info(f"Pinging service {self.ingest_service_status_endpoint}")
-        r = requests.get(self.ingest_service_status_endpoint)
+        r = self.http_session.get(
+            self.ingest_service_status_endpoint, timeout=self.timeout
+        )
         return r.status_code == 200
 
     def __repr__(self):
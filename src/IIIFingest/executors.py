@@ -0,0 +1,47 @@
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+
+from .settings import VALID_EXECUTORS
+
+
+def create_executor(
+    executor: str = "thread",
+    max_workers: Optional[int] = None,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+) -> Executor:
+    """
+    Creates a bounded worker pool. `executor` is either "thread" or "process".
+    """
+    if executor not in VALID_EXECUTORS:
+        raise ValueError(
+            f"Invalid executor: {executor} must be one of: {VALID_EXECUTORS}"
+        )
+    if max_workers is not None and max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+
+    if executor == "process":
+        return ProcessPoolExecutor(
+            max_workers=max_workers, initializer=initializer, initargs=initargs
+        )
+    return ThreadPoolExecutor(
+        max_workers=max_workers, initializer=initializer, initargs=initargs
+    )
+
+
+def bounded_map(
+    pool: Executor, fn: Callable, iterable: Iterable, max_pending: int
+) -> Iterator:
+    """
+    Like `pool.map` over argument tuples, but consumes `iterable` lazily,
+    keeping at most `max_pending` calls in flight. Results are yielded in
+    input order.
+    """
+    pending = deque()
+    for item in iterable:
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+        pending.append(pool.submit(fn, *item))
+    while pending:
+        yield pending.popleft().result()
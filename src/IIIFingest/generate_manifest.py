@@ -1,9 +1,26 @@
+import importlib.resources
+import io
 import json
 import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import chain
+from typing import IO, Callable, Iterable, Iterator, List, Optional, Union
 
 import jsonschema
 from IIIFpres import iiifpapi3
 
+from .executors import create_executor
+
+try:
+    from importlib.resources import files as resource_files
+except ImportError:
+    # Python < 3.9
+    resource_files = None
+
+# Schema set with setManifestSchema, or the bundled schema once loaded
+_manifest_schema: Optional[dict] = None
+
 iiifpapi3.INVALID_URI_CHARACTERS = iiifpapi3.INVALID_URI_CHARACTERS.replace(
     ":", ""
 )  # See https://github.com/giacomomarchioro/pyIIIFpres/issues/11
@@ -12,7 +29,7 @@ iiifpapi3.INVALID_URI_CHARACTERS = iiifpapi3.INVALID_URI_CHARACTERS.replace(
 def createManifest(
     base_url: str,
     labels: list,  # of dicts or strings
-    canvases: list,
+    canvases: Iterable[dict],  # iterated once, so may be a generator
     providers: list = [],
     behaviors: list = ["paged"],
     default_lang: str = "en",
@@ -24,11 +41,16 @@ def createManifest(
     required_statement: list = None,
     summary: list = None,  # can also be str
     thumbnails: list = None,
+    validate: bool = False,
 ) -> iiifpapi3.Manifest():
-    """Creates and validates a IIIF manifest"""
+    """
+    Creates and validates a IIIF manifest. IDs are set from `base_url` directly
+    rather than through the `iiifpapi3.BASE_URL` module global, so manifests
+    can be created concurrently from several threads. With `validate`, the
+    manifest is also checked against the IIIF schema (see `validateManifest`).
+    """
 
     manifest = iiifpapi3.Manifest()
-    iiifpapi3.BASE_URL = base_url + "/"
     manifest.set_id(objid=base_url)
 
     for label in labels:
@@ -94,7 +116,7 @@ def createManifest(
     for idx, d in enumerate(canvases):
         idx += 1
         canvas = manifest.add_canvas_to_items()
-        canvas.set_id(extendbase_url=f"canvas/canvas:{ d.get('asset_id') }")
+        canvas.set_id(objid=f"{base_url}/canvas/canvas:{d.get('asset_id')}")
         canvas.set_height(d["height"])
         canvas.set_width(d["width"])
         if type(d["label"]) is dict:
@@ -113,11 +135,11 @@ def createManifest(
                 )
 
         annopage = canvas.add_annotationpage_to_items()
-        annopage.set_id(extendbase_url=f"annotationPage/annopage:{d.get('asset_id')}")
+        annopage.set_id(objid=f"{base_url}/annotationPage/annopage:{d.get('asset_id')}")
         annotation = annopage.add_annotation_to_items(
             target=canvas.id
         )  # TODO: think about handling multiple annotations (images) per canvas
-        annotation.set_id(extendbase_url=f"annotation/annotation:{d.get('asset_id')}")
+        annotation.set_id(objid=f"{base_url}/annotation/annotation:{d.get('asset_id')}")
         annotation.set_motivation("painting")
         annotation.body.set_id(f"{d.get('id')}{d.get('service')}")
         annotation.body.set_type("Image")
@@ -129,30 +151,488 @@ def createManifest(
         s.set_type(service_type)
         s.set_profile(service_profile)
 
-    # TODO: Validate the manifest here before returning
-    # slightly hacky - pyIIIFpres wants either the objid or extendbase_url to end in "/", but throws an error even if I add extendbase_url="/"
-    # we want an ID without the trailing slash, so pass base_url without it; add the "/" manually in line 27; then set manifest.id back to no slash here
-    manifest.id = base_url
+    if validate:
+        validateManifest(manifest)
+    return manifest
+
+
+def _addLanguageValue(language_map: dict, language: str, text) -> dict:
+    """Adds text to a language map, the way pyIIIFpres `add_label` does."""
+    text = list(text) if isinstance(text, list) else [text]
+    if language in language_map:
+        language_map[language][0:0] = text
+    else:
+        language_map[language] = text
+    return language_map
+
+
+def _metadataEntry(m: dict, default_lang: str) -> dict:
+    value = m["value"]
+    return {
+        "label": {m.get("label_lang", default_lang): [m["label"]]},
+        "value": {
+            m.get("value_lang", default_lang): list(value)
+            if isinstance(value, list)
+            else [value]
+        },
+    }
+
+
+def buildCanvas(
+    base_url: str,
+    d: dict,
+    default_lang: str = "en",
+    service_type: str = "ImageService2",
+    service_profile: str = "level2",
+) -> dict:
+    """
+    Builds a single canvas dict, as added to the manifest items by
+    `buildManifest`, from the canvas data `d`.
+    """
+    canvas_id = f"{base_url}/canvas/canvas:{d.get('asset_id')}"
+    height = int(d["height"])
+    width = int(d["width"])
+
+    canvas = {"id": canvas_id, "type": "Canvas"}
+    if type(d["label"]) is dict:
+        canvas["label"] = {
+            d["label"].get("lang", default_lang): [d["label"].get("value")]
+        }
+    else:
+        canvas["label"] = {default_lang: [d["label"]]}
+    if d.get("metadata"):
+        canvas["metadata"] = [_metadataEntry(m, default_lang) for m in d["metadata"]]
+    canvas["height"] = height
+    canvas["width"] = width
+    canvas["items"] = [
+        {
+            "id": f"{base_url}/annotationPage/annopage:{d.get('asset_id')}",
+            "type": "AnnotationPage",
+            "items": [
+                {
+                    "id": f"{base_url}/annotation/annotation:{d.get('asset_id')}",
+                    "type": "Annotation",
+                    "motivation": "painting",
+                    "body": {
+                        "id": f"{d.get('id')}{d.get('service')}",
+                        "type": "Image",
+                        "format": d.get("format"),
+                        "height": int(d.get("height")),
+                        "width": int(d.get("width")),
+                        "service": [
+                            {
+                                "id": d.get("id"),
+                                "type": service_type,
+                                "profile": service_profile,
+                            }
+                        ],
+                    },
+                    "target": canvas_id,
+                }
+            ],
+        }
+    ]
+    return canvas
+
+
+def _buildManifestHeader(
+    base_url: str,
+    labels: list,
+    providers: list = [],
+    behaviors: list = ["paged"],
+    default_lang: str = "en",
+    manifest_metadata: list = None,
+    rights: str = None,
+    required_statement: list = None,
+    summary: list = None,
+    thumbnails: list = None,
+) -> dict:
+    """Builds the manifest dict up to, but not including, its items."""
+    manifest = {
+        "@context": iiifpapi3.CONTEXT,
+        "id": base_url,
+        "type": "Manifest",
+    }
+
+    label = {}
+    for lbl in labels:
+        if isinstance(lbl, str):
+            _addLanguageValue(label, default_lang, lbl)
+        else:
+            _addLanguageValue(label, lbl.get("lang", default_lang), lbl["label"])
+    if not label:
+        raise ValueError("A Manifest must have the label property")
+    manifest["label"] = label
+
+    if manifest_metadata:
+        manifest["metadata"] = [
+            _metadataEntry(m, default_lang) for m in manifest_metadata
+        ]
+
+    if summary:
+        if isinstance(summary, str):
+            manifest["summary"] = {default_lang: [summary]}
+        else:
+            manifest["summary"] = {
+                s.get("lang", default_lang): [s.get("value")] for s in summary
+            }
+
+    if required_statement:
+        m = required_statement[-1]
+        manifest["requiredStatement"] = {
+            "label": {m.get("label_lang", default_lang): [m["label"]]},
+            "value": {m.get("value_lang", default_lang): [m["value"]]},
+        }
+
+    if rights:
+        manifest["rights"] = rights
+
+    if thumbnails:
+        manifest["thumbnail"] = [
+            {
+                "id": t.get("id"),
+                "type": t.get("type", "Image"),
+                "format": t.get("format", "image/jpeg"),
+                "height": int(t.get("height")),
+                "width": int(t.get("width")),
+            }
+            for t in thumbnails
+        ]
+
+    if behaviors:
+        manifest["behavior"] = list(behaviors)
+
+    if providers:
+        manifest["provider"] = []
+        for p in providers:
+            provider_label = {}
+            for lbl in p["labels"]:
+                _addLanguageValue(
+                    provider_label, lbl.get("lang", default_lang), lbl.get("value")
+                )
+            manifest["provider"].append(
+                {"id": p.get("id"), "type": "Agent", "label": provider_label}
+            )
+    return manifest
+
+
+def buildManifest(
+    base_url: str,
+    labels: list,  # of dicts or strings
+    canvases: Iterable[dict],
+    providers: list = [],
+    behaviors: list = ["paged"],
+    default_lang: str = "en",
+    service_type: str = "ImageService2",
+    service_profile: str = "level2",
+    manifest_metadata: list = None,
+    rights: str = None,
+    required_statement: list = None,
+    summary: list = None,  # can also be str
+    thumbnails: list = None,
+) -> dict:
+    """
+    Builds a IIIF manifest directly as a dict. Takes the same arguments as
+    `createManifest` and returns the same structure (and key order) as
+    `json.loads(createManifest(...).json_dumps())`, without building the
+    pyIIIFpres object graph or serializing it. Unlike `createManifest`, the
+    values are not checked by pyIIIFpres; use `validateManifest` if needed.
+    """
+    manifest = _buildManifestHeader(
+        base_url,
+        labels,
+        providers=providers,
+        behaviors=behaviors,
+        default_lang=default_lang,
+        manifest_metadata=manifest_metadata,
+        rights=rights,
+        required_statement=required_statement,
+        summary=summary,
+        thumbnails=thumbnails,
+    )
+    manifest["items"] = [
+        buildCanvas(base_url, d, default_lang, service_type, service_profile)
+        for d in canvases
+    ]
+    if not manifest["items"]:
+        raise ValueError("A Manifest must have at least one canvas in items")
+    return manifest
+
+
+def writeManifest(
+    output: Union[str, os.PathLike, IO],
+    base_url: str,
+    labels: list,  # of dicts or strings
+    canvases: Iterable[dict],
+    providers: list = [],
+    behaviors: list = ["paged"],
+    default_lang: str = "en",
+    service_type: str = "ImageService2",
+    service_profile: str = "level2",
+    manifest_metadata: list = None,
+    rights: str = None,
+    required_statement: list = None,
+    summary: list = None,  # can also be str
+    thumbnails: list = None,
+) -> int:
+    """
+    Writes a IIIF manifest as JSON to `output`, a file path or a text or binary
+    file object (e.g. an open file or `socket.makefile("wb")`). The manifest
+    header is written first, then each canvas as it is taken from `canvases`,
+    then the closing brackets, so only one canvas is held in memory at a time.
+    Takes the same arguments as `buildManifest` and writes the same JSON as
+    `json.dumps(buildManifest(...))`. Returns the number of canvases written.
+    """
+    manifest = _buildManifestHeader(
+        base_url,
+        labels,
+        providers=providers,
+        behaviors=behaviors,
+        default_lang=default_lang,
+        manifest_metadata=manifest_metadata,
+        rights=rights,
+        required_statement=required_statement,
+        summary=summary,
+        thumbnails=thumbnails,
+    )
+    canvases = iter(canvases)
+    first = next(canvases, None)
+    if first is None:
+        raise ValueError("A Manifest must have at least one canvas in items")
+
+    args = (
+        manifest,
+        chain([first], canvases),
+        base_url,
+        default_lang,
+        service_type,
+        service_profile,
+    )
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, "w", encoding="utf-8") as fp:
+            return _writeManifest(fp.write, *args)
+    if isinstance(output, io.TextIOBase):
+        return _writeManifest(output.write, *args)
+    return _writeManifest(lambda text: output.write(text.encode("utf-8")), *args)
+
+
+def _writeManifest(
+    write: Callable[[str], None],
+    manifest: dict,
+    canvases: Iterator[dict],
+    base_url: str,
+    default_lang: str,
+    service_type: str,
+    service_profile: str,
+) -> int:
+    # Drop the closing brace of the header and append the items one by one
+    write(json.dumps(manifest)[:-1])
+    write(', "items": [')
+    count = 0
+    for d in canvases:
+        if count:
+            write(", ")
+        write(
+            json.dumps(
+                buildCanvas(base_url, d, default_lang, service_type, service_profile)
+            )
+        )
+        count += 1
+    write("]}")
+    return count
+
+
+def _canvasAssetId(canvas: dict, prefix: str) -> Optional[str]:
+    canvas_id = canvas.get("id", "")
+    return canvas_id[len(prefix) :] if canvas_id.startswith(prefix) else None
+
+
+def updateManifest(
+    manifest: dict,
+    canvases: Iterable[dict] = (),
+    remove: Iterable[str] = (),
+    default_lang: str = "en",
+    service_type: str = "ImageService2",
+    service_profile: str = "level2",
+) -> dict:
+    """
+    Updates a manifest dict, as built by `buildManifest` or `createManifest`,
+    in place. Each of `canvases` (canvas data as passed to `buildManifest`)
+    replaces the canvas with the same `asset_id` at its current position, or
+    is appended if the manifest has no such canvas. Canvases whose asset IDs
+    are in `remove` are dropped. Asset IDs are matched against canvas IDs of
+    the form `{manifest id}/canvas/canvas:{asset_id}`.
+
+    Only the added or replaced canvases (with their annotation pages) are
+    built; the rest of the manifest is left untouched. Raises `KeyError`
+    without modifying the manifest if an asset ID in `remove` is not found.
+    Returns the number of canvases `added`, `replaced` and `removed`.
+    """
+    base_url = manifest["id"]
+    prefix = f"{base_url}/canvas/canvas:"
+    items = manifest.setdefault("items", [])
+    positions = {}
+    for position, canvas in enumerate(items):
+        asset_id = _canvasAssetId(canvas, prefix)
+        if asset_id is not None:
+            positions[asset_id] = position
+
+    remove = set(remove)
+    missing = remove - positions.keys()
+    if missing:
+        raise KeyError(f"Canvases not found for asset IDs: {sorted(missing)}")
+    updates = {
+        str(d.get("asset_id")): buildCanvas(
+            base_url, d, default_lang, service_type, service_profile
+        )
+        for d in canvases
+    }
+
+    result = {"added": 0, "replaced": 0, "removed": len(remove)}
+    for asset_id, canvas in updates.items():
+        if asset_id in positions:
+            items[positions[asset_id]] = canvas
+            result["replaced"] += 1
+        else:
+            items.append(canvas)
+            result["added"] += 1
+    if remove:
+        removed = {positions[asset_id] for asset_id in remove}
+        items[:] = [c for pos, c in enumerate(items) if pos not in removed]
+    return result
+
+
+def getManifestSchema() -> dict:
+    """
+    Returns the IIIF Presentation 3.0 schema used to validate manifests: the
+    schema set with `setManifestSchema`, or else the schema bundled with the
+    package (`schema/iiif_3_0.json`), read once per process.
+    """
+    global _manifest_schema
+    if _manifest_schema is None:
+        if resource_files is not None:
+            schema_file = resource_files("IIIFingest.schema") / "iiif_3_0.json"
+            text = schema_file.read_text()
+        else:
+            text = importlib.resources.read_text("IIIFingest.schema", "iiif_3_0.json")
+        _manifest_schema = json.loads(text)
+    return _manifest_schema
+
+
+def setManifestSchema(schema: Optional[Union[dict, str, os.PathLike]]):
+    """
+    Overrides the schema used to validate manifests with a dict or the path
+    to a JSON file, e.g. a newer copy of the IIIF presentation validator's
+    `iiif_3_0.json`. None restores the bundled schema.
+    """
+    global _manifest_schema
+    if isinstance(schema, (str, os.PathLike)):
+        with open(schema) as schema_file:
+            schema = json.load(schema_file)
+    _manifest_schema = schema
+    getManifestValidator.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def getManifestValidator() -> "jsonschema.protocols.Validator":
+    """
+    Returns a validator for the schema from `getManifestSchema`. The schema is
+    loaded and compiled once per process and the validator is shared, so
+    repeated validation only pays for the check itself.
+    """
+    schema = getManifestSchema()
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
+def _loadManifest(
+    manifest: Union[str, os.PathLike, dict, iiifpapi3.Manifest], read_from_file: bool
+) -> dict:
+    if isinstance(manifest, iiifpapi3.Manifest):
+        return json.loads(manifest.json_dumps())
+    if isinstance(manifest, os.PathLike) or (
+        read_from_file and isinstance(manifest, str)
+    ):
+        with open(manifest) as instance:
+            return json.load(instance)
+    if isinstance(manifest, str):
+        return json.loads(manifest)
     return manifest
 
 
-def validateManifest(manifest: iiifpapi3.Manifest(), read_from_file: bool = True):
-    """Validates a manifest. If you pass a string and read_from_file to True, it will read the JSON file to validate"""
-    if not os.path.exists('iiif_3_0.json'):
-        import urllib.request
-
-        jsonchemadownloadurl = r"https://raw.githubusercontent.com/IIIF/presentation-validator/master/schema/iiif_3_0.json"
-        with urllib.request.urlopen(jsonchemadownloadurl) as response, open(
-            "iiif_3_0.json", 'wb'
-        ) as out_file:
-            data = response.read()
-            out_file.write(data)
-    if read_from_file:
-        with open(manifest) as instance, open("iiif_3_0.json") as schema:
-            jsonschema.validate(instance=json.load(instance), schema=json.load(schema))
+def validateManifest(
+    manifest: Union[str, os.PathLike, dict, iiifpapi3.Manifest],
+    read_from_file: bool = True,
+):
+    """
+    Validates a manifest against the IIIF Presentation 3.0 schema (see
+    `getManifestSchema`), raising a `jsonschema.ValidationError` if it is
+    invalid. The manifest may be a dict, a pyIIIFpres `Manifest`, or a path to
+    a JSON file. If `read_from_file` is False, a string is parsed as manifest
+    JSON rather than read as a path.
+    """
+    getManifestValidator().validate(_loadManifest(manifest, read_from_file))
+
+
+@dataclass
+class ManifestValidationResult:
+    """
+    Outcome of validating one manifest with `validateManifests`. `manifest_id`
+    is the file path, or the manifest `id` for a manifest passed as a dict.
+    """
+
+    manifest_id: Optional[str]
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _validateOne(manifest: Union[str, os.PathLike, dict]) -> ManifestValidationResult:
+    """Validates one manifest for `validateManifests`, collecting every error."""
+    if isinstance(manifest, (str, os.PathLike)):
+        manifest_id = os.fspath(manifest)
     else:
-        with open("iiif_3_0.json") as schema:
-            jsonschema.validate(instance=json.load(instance), schema=json.load(schema))
+        manifest_id = manifest.get("id")
+    try:
+        instance = _loadManifest(manifest, read_from_file=True)
+    except (OSError, ValueError) as e:
+        return ManifestValidationResult(manifest_id=manifest_id, errors=[str(e)])
+    errors = [
+        f"{error.json_path}: {error.message}"
+        for error in getManifestValidator().iter_errors(instance)
+    ]
+    return ManifestValidationResult(manifest_id=manifest_id, errors=errors)
+
+
+def validateManifests(
+    manifests: Iterable[Union[str, os.PathLike, dict]],
+    workers: Optional[int] = None,
+    executor: str = "process",
+    chunksize: Optional[int] = None,
+) -> List[ManifestValidationResult]:
+    """
+    Validates many manifests (dicts or paths to JSON files) across a pool of
+    `workers` processes (or threads, with `executor="thread"`). The schema is
+    loaded once and passed to each process, which compiles it once and reuses
+    it for every manifest it checks.
+
+    Returns a `ManifestValidationResult` per manifest, in input order, listing
+    all schema errors rather than raising on the first invalid manifest.
+    """
+    manifests = list(manifests)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(manifests) // (workers * 4))
+
+    pool_args = {}
+    if executor == "process":
+        pool_args = dict(initializer=setManifestSchema, initargs=(getManifestSchema(),))
+    with create_executor(executor, max_workers=workers, **pool_args) as pool:
+        return list(pool.map(_validateOne, manifests, chunksize=chunksize))
 
 
 # TODO move tests to an actual tests file, generate test manifests and read in and compare
@@ -1,9 +1,17 @@
+import gzip
+import heapq
+import itertools
+import json
 import logging
+import random
 import time
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from urllib import request
 
 import requests
+from requests.adapters import HTTPAdapter
 
 # Backports supports Python 3.6-3.8
 try:
@@ -11,8 +19,48 @@ try:
 except ImportError:
     from backports.zoneinfo import ZoneInfo
 
+# Optional faster JSON serializer, installed with the "fast" extra
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .executors import create_executor
+from .metrics import get_metrics
+from .settings import (
+    GZIP_COMPRESSLEVEL,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_POOL_MAXSIZE,
+    HTTP_READ_TIMEOUT,
+    INGEST_CHUNK_ASSETS,
+    INGEST_CHUNK_BYTES,
+    JOB_POLL_BACKOFF,
+    JOB_POLL_DEADLINE,
+    JOB_POLL_INITIAL_INTERVAL,
+    JOB_POLL_JITTER,
+    JOB_POLL_MAX_INTERVAL,
+)
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+# Job statuses that are polled again; any other status ends tracking of a job
+PENDING_JOB_STATUSES = ("queued", "running")
+
+
+def create_http_session(pool_maxsize: int = HTTP_POOL_MAXSIZE) -> requests.Session:
+    """
+    Creates a requests session with keep-alive connection pooling for MPS API
+    calls. `pool_maxsize` should be at least the number of threads making
+    requests through the session concurrently.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 
 # For consistency, either imageAsset should also be a class, or turn IIIFCanvas into a method which wraps dict properties
 # Currently, generate_manifest expects a list of dicts
@@ -72,73 +120,421 @@ def wrapIngestRequest(
     return req
 
 
-def sendIngestRequest(req: dict, endpoint: str, token) -> request:
-    r = requests.post(endpoint, headers={"Authorization": f"Bearer {token}"}, json=req)
+def chunkIngestAssets(
+    assets: list,
+    max_assets: int = INGEST_CHUNK_ASSETS,
+    max_bytes: int = INGEST_CHUNK_BYTES,
+    reserved_bytes: int = 0,
+    serializer: Optional[Callable[[dict], bytes]] = None,
+) -> list:
+    """
+    Splits ingest assets into chunks of at most `max_assets` assets whose JSON
+    encoding totals at most `max_bytes` (a single larger asset gets a chunk of
+    its own). Assets are sized with `serializer` (default: `serializeJson`),
+    as they will be encoded by `encodeRequestBody`. `reserved_bytes` are set
+    aside in the final chunk, e.g. for the manifest sent with it. Assets keep
+    their order across the chunks, and at least one (possibly empty) chunk is
+    returned.
+    """
+    if max_assets < 1:
+        raise ValueError("max_assets must be at least 1")
+    if serializer is None:
+        serializer = serializeJson
+
+    # Fill chunks from the end so the reserved space lands in the final chunk
+    chunks = []
+    chunk = []
+    size = reserved_bytes
+    for asset in reversed(assets):
+        asset_size = len(serializer(asset)) + 1  # with the "," separator
+        if chunk and (len(chunk) >= max_assets or size + asset_size > max_bytes):
+            chunks.append(chunk[::-1])
+            chunk = []
+            size = 0
+        chunk.append(asset)
+        size += asset_size
+    chunks.append(chunk[::-1])
+    return chunks[::-1]
+
+
+def serializeJson(obj) -> bytes:
+    """Serializes `obj` to compact UTF-8 JSON, using orjson if it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def encodeRequestBody(
+    req: dict,
+    serializer: Optional[Callable[[dict], bytes]] = None,
+    gzip_threshold: Optional[int] = None,
+    serialized: Optional[bytes] = None,
+) -> Tuple[bytes, dict]:
+    """
+    Encodes a request body with `serializer` (default: `serializeJson`), or
+    uses `serialized` if `req` has already been serialized. If
+    `gzip_threshold` is set, bodies of at least that many bytes are gzipped.
+    Returns the body and the content headers to send with it.
+    """
+    with get_metrics().timer("iiifingest_ingest_encode_seconds"):
+        body = (
+            serialized if serialized is not None else (serializer or serializeJson)(req)
+        )
+        headers = {"Content-Type": "application/json"}
+        if gzip_threshold is not None and len(body) >= gzip_threshold:
+            body = gzip.compress(body, compresslevel=GZIP_COMPRESSLEVEL)
+            headers["Content-Encoding"] = "gzip"
+    return body, headers
+
+
+def sendIngestRequest(
+    req: dict,
+    endpoint: str,
+    token,
+    session: requests.Session = None,
+    timeout=DEFAULT_TIMEOUT,
+    serializer: Optional[Callable[[dict], bytes]] = None,
+    gzip_threshold: Optional[int] = None,
+    serialized: Optional[bytes] = None,
+) -> request:
+    """
+    Posts an ingest request. Uses `session` for connection reuse if given;
+    `timeout` is a requests (connect, read) timeout in seconds. The body is
+    encoded with `encodeRequestBody` using `serializer`, `gzip_threshold` and
+    `serialized`.
+    """
+    body, headers = encodeRequestBody(req, serializer, gzip_threshold, serialized)
+    metrics = get_metrics()
+    metrics.increment("iiifingest_ingest_request_bytes_total", len(body))
+    http = session or requests
+    with metrics.timer("iiifingest_ingest_request_seconds"):
+        r = http.post(
+            endpoint,
+            headers={"Authorization": f"Bearer {token}", **headers},
+            data=body,
+            timeout=timeout,
+        )
+    metrics.increment(
+        "iiifingest_ingest_requests_total", labels={"status": r.status_code}
+    )
     return r
 
 
 def jobStatus(
     job_id: str,
     endpoint: str = "https://mps-admin-qa.lib.harvard.edu/admin/ingest/jobstatus/",
+    session: requests.Session = None,
+    timeout=DEFAULT_TIMEOUT,
 ) -> request:
     url = f"{endpoint}{job_id}"
-    r = requests.get(url)
+    http = session or requests
+    metrics = get_metrics()
+    metrics.increment("iiifingest_job_polls_total")
+    with metrics.timer("iiifingest_job_poll_seconds"):
+        r = http.get(url, timeout=timeout)
     return r
 
 
+@dataclass
+class JobUpdate:
+    """
+    A status update for one job tracked by `JobMonitor`. `done` is set once the
+    job reached a terminal status or the monitor gave up on it; `completed` is
+    set if the job succeeded.
+    """
+
+    job_id: str
+    job_status: Optional[str]
+    status: dict
+    pings: int
+    elapsed: float
+    done: bool = False
+    completed: bool = False
+    error: Optional[str] = None
+
+
+def _observe_job_wait(update: JobUpdate):
+    get_metrics().observe(
+        "iiifingest_job_wait_seconds",
+        update.elapsed,
+        {"status": update.job_status or "unknown"},
+    )
+
+
+def pollDelay(
+    attempt: int,
+    initial_interval: float = JOB_POLL_INITIAL_INTERVAL,
+    max_interval: float = JOB_POLL_MAX_INTERVAL,
+    backoff: float = JOB_POLL_BACKOFF,
+    jitter: float = JOB_POLL_JITTER,
+) -> float:
+    """
+    Returns the delay in seconds before poll `attempt` + 1 of a job: the
+    `initial_interval` grown by a factor of `backoff` per attempt, capped at
+    `max_interval`, and randomly spread by up to +/- `jitter` (a fraction) so
+    that many pollers do not hit the endpoint in lockstep.
+    """
+    delay = min(max_interval, initial_interval * backoff ** max(attempt - 1, 0))
+    return max(0.0, delay * random.uniform(1 - jitter, 1 + jitter))
+
+
+def iterJobStatus(
+    job_id: str,
+    endpoint: str = "https://mps-admin-qa.lib.harvard.edu/admin/ingest/jobstatus/",
+    max_pings: Optional[int] = 25,
+    interval: float = JOB_POLL_MAX_INTERVAL,
+    initial_interval: float = JOB_POLL_INITIAL_INTERVAL,
+    backoff: float = JOB_POLL_BACKOFF,
+    jitter: float = JOB_POLL_JITTER,
+    deadline: Optional[float] = JOB_POLL_DEADLINE,
+    session: requests.Session = None,
+    timeout=DEFAULT_TIMEOUT,
+) -> Iterator[JobUpdate]:
+    """
+    Polls a job and yields a `JobUpdate` each time its status changes. The
+    job is polled at once, then after delays given by `pollDelay`, starting at
+    `initial_interval` seconds and backing off up to `interval` seconds.
+
+    The last update has `done` set. It is yielded when the job reaches a
+    terminal status, returns an unknown status, or after `max_pings` polls or
+    `deadline` seconds, whichever comes first (`None` disables either limit).
+    `interval` is the longest delay between polls, not a fixed delay; the
+    default `deadline` of `JOB_POLL_DEADLINE` seconds keeps the total wait
+    close to that of 25 polls 10 seconds apart.
+    """
+    start = time.monotonic()
+    pings = 0
+    last_status = None
+    while True:
+        pings += 1
+        status = jobStatus(job_id, endpoint, session=session, timeout=timeout).json()
+        job_status = status.get("data", {}).get("job_status")
+        elapsed = time.monotonic() - start
+        update = JobUpdate(
+            job_id=job_id,
+            job_status=job_status,
+            status=status,
+            pings=pings,
+            elapsed=elapsed,
+            completed=job_status == "success",
+        )
+        delay = pollDelay(pings, initial_interval, interval, backoff, jitter)
+        if deadline is not None:
+            delay = min(delay, deadline - elapsed)
+        out_of_pings = max_pings is not None and pings >= max_pings
+        if job_status not in PENDING_JOB_STATUSES or out_of_pings or delay <= 0:
+            update.done = True
+            _observe_job_wait(update)
+            yield update
+            return
+        if job_status != last_status:
+            last_status = job_status
+            yield update
+        time.sleep(delay)
+
+
 def pingJob(
     job_id: str,
     endpoint: str = "https://mps-admin-qa.lib.harvard.edu/admin/ingest/jobstatus/",
     max_pings: int = 25,
-    interval: int = 10,
+    interval: int = JOB_POLL_MAX_INTERVAL,
+    session: requests.Session = None,
+    timeout=DEFAULT_TIMEOUT,
+    initial_interval: float = JOB_POLL_INITIAL_INTERVAL,
+    backoff: float = JOB_POLL_BACKOFF,
+    jitter: float = JOB_POLL_JITTER,
+    deadline: Optional[float] = JOB_POLL_DEADLINE,
 ) -> dict:
-    working = True
-    completed = False
-    start = time.time()
-    pings = 0
-    status = {}
-    while working:
-        pings += 1
-        r = jobStatus(job_id, endpoint)
-        status = r.json()
-        end = time.time()
-        msg = ""
-        if status["data"].get("job_status") == "success":
-            msg = f"------- Job {job_id} finished ingesting after {round(end - start)} seconds and {pings} pings -------"
-            logger.debug(msg)
-            logger.debug(status)
-            completed = True
-            working = False
-        elif status["data"].get("job_status") == "running":
-            msg = f"-------- Job {job_id} processing. {round(end - start)} seconds and {pings} pings -------"
-            logger.debug(msg)
-            logger.debug(status)
-            time.sleep(interval)
-        elif status["data"].get("job_status") == "failed":
-            msg = f"-------- Job {job_id} Failed. {round(end - start)} seconds and {pings} pings -------"
-            logger.debug(msg)
-            logger.debug(status)
-            working = False
-        elif status["data"].get("job_status") == "queued":
-            msg = f"-------- Job {job_id} queued. {round(end - start)} seconds and {pings} pings -------"
-            logger.debug(msg)
-            logger.debug(status)
-            time.sleep(interval)
-        elif pings > max_pings:
-            msg = f"-------- Job {job_id} did not complete within {round(end - start)} seconds and {pings} pings (max pings {max_pings})"
-            logger.debug(status)
-            working = False
-        else:
-            msg = f"-------- Job {job_id} delivered an invalid status. {round(end - start)} seconds and {pings} pings -------"
-            logger.debug(status)
-            working = False
+    """
+    Polls a job until it finishes, fails, or the `max_pings` or `deadline`
+    limit is reached, backing off between polls as described in
+    `iterJobStatus`. `interval` is the longest delay between polls rather
+    than a fixed delay, so the total wait is bounded by `deadline` (by default
+    `JOB_POLL_DEADLINE`, 250 seconds); pass `deadline=None` to poll for up to
+    `max_pings` times.
+    """
+    for update in iterJobStatus(
+        job_id,
+        endpoint,
+        max_pings=max_pings,
+        interval=interval,
+        initial_interval=initial_interval,
+        backoff=backoff,
+        jitter=jitter,
+        deadline=deadline,
+        session=session,
+        timeout=timeout,
+    ):
+        logger.debug(
+            f"-------- Job {job_id} {update.job_status}. {round(update.elapsed)} seconds and {update.pings} pings -------"
+        )
+        logger.debug(update.status)
+
+    if update.job_status == "success":
+        msg = f"------- Job {job_id} finished ingesting after {round(update.elapsed)} seconds and {update.pings} pings -------"
+    elif update.job_status == "failed":
+        msg = f"-------- Job {job_id} Failed. {round(update.elapsed)} seconds and {update.pings} pings -------"
+    elif update.job_status in PENDING_JOB_STATUSES:
+        msg = f"-------- Job {job_id} did not complete within {round(update.elapsed)} seconds and {update.pings} pings (max pings {max_pings})"
+    else:
+        msg = f"-------- Job {job_id} delivered an invalid status. {round(update.elapsed)} seconds and {update.pings} pings -------"
 
     return {
-        "completed": completed,
+        "completed": update.completed,
         "message": msg,
         "job_id": job_id,
         "endpoint": endpoint,
-        "pings": pings,
-        "elapsed": round(time.time() - start),
-        "job_status": status["data"].get("job_status"),
+        "pings": update.pings,
+        "elapsed": round(update.elapsed),
+        "job_status": update.job_status,
     }
+
+
+class JobMonitor:
+    """
+    Polls the status of many ingest jobs from a single scheduler loop, rather
+    than one blocking `pingJob` call per job. Each job has its own next poll
+    time, kept in a heap and backed off as for `iterJobStatus`; jobs that are
+    due are fetched concurrently by up to `max_workers` threads, and a job
+    drops out as soon as it reaches a terminal status (`success` or `failed`),
+    returns an unknown status, or has been polled `max_pings` times.
+
+    Updates are delivered through the `on_update` callback (every update) and
+    the `on_complete` callback (the final update of each job), and are also
+    yielded by `updates()`. `run()` returns the final update of every job.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = "https://mps-admin-qa.lib.harvard.edu/admin/ingest/jobstatus/",
+        interval: float = JOB_POLL_MAX_INTERVAL,
+        max_pings: int = 25,
+        max_workers: int = 8,
+        initial_interval: float = JOB_POLL_INITIAL_INTERVAL,
+        backoff: float = JOB_POLL_BACKOFF,
+        jitter: float = JOB_POLL_JITTER,
+        session: requests.Session = None,
+        timeout=DEFAULT_TIMEOUT,
+        on_update: Optional[Callable[[JobUpdate], None]] = None,
+        on_complete: Optional[Callable[[JobUpdate], None]] = None,
+    ):
+        self.endpoint = endpoint
+        self.interval = interval
+        self.max_pings = max_pings
+        self.max_workers = max_workers
+        self.initial_interval = initial_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.session = session
+        self.timeout = timeout
+        self.on_update = on_update
+        self.on_complete = on_complete
+        self._schedule = []  # heap of (next poll time, sequence, job_id)
+        self._jobs = {}  # job_id -> (start time, pings)
+        self._sequence = itertools.count()
+        self._pool = None  # thread pool shared by the passes of updates()
+
+    def add(self, job_id: str):
+        """Starts tracking a job, polling it on the next pass."""
+        if job_id in self._jobs:
+            return
+        now = time.monotonic()
+        self._jobs[job_id] = (now, 0)
+        heapq.heappush(self._schedule, (now, next(self._sequence), job_id))
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._jobs
+
+    def _fetch(self, job_id: str) -> Tuple[dict, Optional[str]]:
+        try:
+            r = jobStatus(
+                job_id, self.endpoint, session=self.session, timeout=self.timeout
+            )
+            return r.json(), None
+        except (requests.RequestException, ValueError) as e:
+            return {}, str(e)
+
+    def _update(self, job_id: str, status: dict, error: Optional[str]) -> JobUpdate:
+        start, pings = self._jobs[job_id]
+        pings += 1
+        job_status = status.get("data", {}).get("job_status")
+        update = JobUpdate(
+            job_id=job_id,
+            job_status=job_status,
+            status=status,
+            pings=pings,
+            elapsed=time.monotonic() - start,
+            completed=job_status == "success",
+            error=error,
+        )
+        pending = error is not None or job_status in PENDING_JOB_STATUSES
+        if pending and pings < self.max_pings:
+            self._jobs[job_id] = (start, pings)
+            delay = pollDelay(
+                pings, self.initial_interval, self.interval, self.backoff, self.jitter
+            )
+            heapq.heappush(
+                self._schedule,
+                (time.monotonic() + delay, next(self._sequence), job_id),
+            )
+        else:
+            update.done = True
+            _observe_job_wait(update)
+            del self._jobs[job_id]
+        logger.debug(f"Job {job_id} status {job_status} after {pings} pings")
+        return update
+
+    def poll(self) -> List[JobUpdate]:
+        """
+        Fetches the status of every job that is due, without waiting. Returns
+        the resulting updates.
+        """
+        now = time.monotonic()
+        due = []
+        while self._schedule and self._schedule[0][0] <= now:
+            due.append(heapq.heappop(self._schedule)[2])
+        if len(due) > 1 and self._pool is not None:
+            fetched = list(self._pool.map(self._fetch, due))
+        elif len(due) > 1 and self.max_workers > 1:
+            workers = min(self.max_workers, len(due))
+            with create_executor("thread", max_workers=workers) as pool:
+                fetched = list(pool.map(self._fetch, due))
+        else:
+            fetched = [self._fetch(job_id) for job_id in due]
+
+        updates = []
+        for job_id, (status, error) in zip(due, fetched):
+            update = self._update(job_id, status, error)
+            if self.on_update:
+                self.on_update(update)
+            if update.done and self.on_complete:
+                self.on_complete(update)
+            updates.append(update)
+        return updates
+
+    def updates(self) -> Iterator[JobUpdate]:
+        """
+        Yields status updates until every job is done, sleeping until the next
+        job is due between passes. Jobs may be added while iterating. The
+        passes share one pool of `max_workers` threads.
+        """
+        owns_pool = self.max_workers > 1 and self._pool is None
+        if owns_pool:
+            self._pool = create_executor("thread", max_workers=self.max_workers)
+        try:
+            while self._schedule:
+                delay = self._schedule[0][0] - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                yield from self.poll()
+        finally:
+            if owns_pool:
+                self._pool.shutdown()
+                self._pool = None
+
+    def run(self) -> Dict[str, JobUpdate]:
+        """Polls until every job is done. Returns the final update of each job."""
+        return {update.job_id: update for update in self.updates() if update.done}
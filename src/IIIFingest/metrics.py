@@ -0,0 +1,171 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds, as used by Prometheus client libraries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Optional[dict]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ()
+
+
+class MetricsCollector:
+    """
+    Receives counters and timings from the ingest pipeline. This base class
+    discards everything and is the default collector; subclass it (or use
+    `InMemoryMetrics`) and pass an instance to `set_metrics` to record them.
+
+    Metrics recorded in `process` pool workers stay in those processes.
+    """
+
+    def increment(self, name: str, value: float = 1, labels: Optional[dict] = None):
+        """Adds `value` to a counter."""
+
+    def observe(self, name: str, value: float, labels: Optional[dict] = None):
+        """Records one observation (e.g. a duration in seconds) in a histogram."""
+
+    def timer(self, name: str, labels: Optional[dict] = None):
+        """Returns a context manager observing the time spent in its block."""
+        return nullcontext()
+
+
+@dataclass
+class Histogram:
+    """Observation counts per bucket upper bound, with their count and sum."""
+
+    buckets: Tuple[float, ...]
+    counts: List[int] = field(default_factory=list)
+    count: int = 0
+    sum: float = 0.0
+
+    def __post_init__(self):
+        if not self.counts:
+            self.counts = [0] * len(self.buckets)
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def copy(self) -> "Histogram":
+        return Histogram(self.buckets, list(self.counts), self.count, self.sum)
+
+    def to_prometheus(self, name: str, labels: Labels) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            bucket_labels = _format_labels(labels + (("le", _format(bound)),))
+            lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+        inf_labels = _format_labels(labels + (("le", "+Inf"),))
+        lines.append(f"{name}_bucket{inf_labels} {self.count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {self.count}")
+        return lines
+
+
+class InMemoryMetrics(MetricsCollector):
+    """
+    Thread-safe collector keeping counters and histograms in memory, with a
+    Prometheus text format exporter (`to_prometheus`).
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, labels: Optional[dict] = None):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[dict] = None):
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, labels: Optional[dict] = None) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    def counter(self, name: str, labels: Optional[dict] = None) -> float:
+        """Returns the current value of a counter (0 if never incremented)."""
+        with self._lock:
+            return self._counters.get(name, {}).get(_labels(labels), 0)
+
+    def histogram(self, name: str, labels: Optional[dict] = None) -> Histogram:
+        """Returns a copy of a histogram (empty if never observed)."""
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(_labels(labels))
+            return histogram.copy() if histogram else Histogram(self.buckets)
+
+    def reset(self):
+        """Discards all recorded metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_prometheus(self) -> str:
+        """Returns all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name in sorted(self._counters):
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_format_labels(labels)} {_format(value)}")
+            for name in sorted(self._histograms):
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(self._histograms[name].items()):
+                    lines.extend(histogram.to_prometheus(name, labels))
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+_metrics = MetricsCollector()
+
+
+def get_metrics() -> MetricsCollector:
+    """Returns the collector that library code records metrics to."""
+    return _metrics
+
+
+def set_metrics(collector: Optional[MetricsCollector]) -> MetricsCollector:
+    """
+    Sets the collector that library code records metrics to, or restores the
+    default no-op collector if `collector` is None. Returns the collector.
+    """
+    global _metrics
+    _metrics = collector if collector is not None else MetricsCollector()
+    return _metrics
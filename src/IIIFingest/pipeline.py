@@ -0,0 +1,216 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .asset import Asset
+from .ingest import JobUpdate
+from .settings import PIPELINE_QUEUE_SIZE
+
+# Marks the end of the items in a queue
+_DONE = object()
+# Seconds between checks for cancellation while blocked on a queue
+_POLL_INTERVAL = 0.1
+
+
+@dataclass
+class StageStats:
+    """
+    Items processed by a pipeline stage, the time its workers spent on them
+    (`busy_seconds`, summed across workers), and the wall time from the first
+    item starting to the last one finishing.
+    """
+
+    name: str
+    workers: int = 1
+    items: int = 0
+    busy_seconds: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Items per second of wall time."""
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def add(self, started: float, finished: float, items: int = 1):
+        self.items += items
+        self.busy_seconds += finished - started
+        if self.started is None or started < self.started:
+            self.started = started
+        if self.finished is None or finished > self.finished:
+            self.finished = finished
+
+
+@dataclass
+class PipelineResult:
+    """
+    Outcome of `Client.run_pipeline`. `assets` are the uploaded assets in input
+    order. If the run was cancelled, `cancelled` is set, `assets` holds the
+    images that had entered the pipeline before it stopped, and the manifest
+    and ingest steps that had not started are left as None.
+    """
+
+    assets: List[Asset] = field(default_factory=list)
+    manifest: Optional[dict] = None
+    ingest: Optional[dict] = None
+    jobs: Optional[Dict[str, JobUpdate]] = None
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    cancelled: bool = False
+
+    @property
+    def ok(self) -> bool:
+        if self.cancelled or self.ingest is None or self.ingest["error"] is not None:
+            return False
+        return all(update.completed for update in (self.jobs or {}).values())
+
+
+class Pipeline:
+    """
+    Runs stages of worker threads connected by bounded queues, so that each
+    stage works on some items while the next works on others, and a slow stage
+    holds back those before it instead of letting items pile up in memory.
+
+    Setting `cancel` stops feeding new items; the items already fed still pass
+    through every stage, so each item a stage has worked on reaches `results`.
+    An error in any stage instead stops every stage after the items in
+    progress; `results` then stops yielding, and `join` re-raises the first
+    error.
+    """
+
+    def __init__(
+        self,
+        cancel: Optional[threading.Event] = None,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+    ):
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        self.cancel = cancel if cancel is not None else threading.Event()
+        self.queue_size = queue_size
+        self.stages: Dict[str, StageStats] = {}
+        self.error: Optional[BaseException] = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set() or self.cancel.is_set()
+
+    def _put(self, q: queue.Queue, item, cancellable: bool = False) -> bool:
+        """
+        Puts `item` on `q`, giving up if the pipeline stops (or, if
+        `cancellable`, is cancelled) first.
+        """
+        while not (self.stopped if cancellable else self._stopped.is_set()):
+            try:
+                q.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._stopped.is_set():
+            try:
+                return q.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def _start(self, name: str, target: Callable, *args):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _fail(self, error: BaseException):
+        with self._lock:
+            if self.error is None:
+                self.error = error
+        self._stopped.set()
+
+    def feed(self, items: Iterable) -> queue.Queue:
+        """
+        Returns a queue that a thread fills with `items`, until the end of
+        `items` or cancellation.
+        """
+        outbox = queue.Queue(self.queue_size)
+
+        def run():
+            try:
+                for item in items:
+                    if not self._put(outbox, item, cancellable=True):
+                        break
+                self._put(outbox, _DONE)
+            except BaseException as e:
+                self._fail(e)
+
+        self._start("feed", run)
+        return outbox
+
+    def stage(
+        self, name: str, fn: Callable[[Any], Any], inbox: queue.Queue, workers: int = 1
+    ) -> queue.Queue:
+        """
+        Starts `workers` threads applying `fn` to the items of `inbox`, and
+        returns the queue of results. Results may be out of input order.
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        stats = self.stages[name] = StageStats(name=name, workers=workers)
+        outbox = queue.Queue(self.queue_size)
+        remaining = [workers]
+
+        def run():
+            try:
+                while True:
+                    item = self._get(inbox)
+                    if item is _DONE:
+                        # Pass the end marker on to this stage's other workers
+                        self._put(inbox, _DONE)
+                        break
+                    started = time.perf_counter()
+                    result = fn(item)
+                    finished = time.perf_counter()
+                    with self._lock:
+                        stats.add(started, finished)
+                    if not self._put(outbox, result):
+                        return
+            except BaseException as e:
+                self._fail(e)
+                return
+            with self._lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._put(outbox, _DONE)
+
+        for idx in range(workers):
+            self._start(f"{name}-{idx}", run)
+        return outbox
+
+    def results(self, outbox: queue.Queue) -> Iterator:
+        """Yields the items of `outbox` until the end of the pipeline."""
+        while True:
+            item = self._get(outbox)
+            if item is _DONE:
+                return
+            yield item
+
+    def join(self):
+        """
+        Stops and waits for all threads, re-raising the first error raised in
+        a stage.
+        """
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,192 @@
+import os
+import struct
+from typing import BinaryIO, Optional, Tuple, Union
+
+# Bytes read up front to identify the format
+HEADER_SIZE = 32
+
+# Header signatures
+TIFF_LE = b"II"
+TIFF_BE = b"MM"
+JPEG_SOI = b"\xff\xd8"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JP2_SIGNATURE = b"\x00\x00\x00\x0cjP  \r\n\x87\n"
+J2K_SIGNATURE = b"\xff\x4f\xff\x51"
+
+# MIME types for recognized signatures, matching what libmagic reports
+MIME_TYPES = (
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"II+\x00", "image/tiff"),
+    (b"MM\x00+", "image/tiff"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (PNG_SIGNATURE, "image/png"),
+    (JP2_SIGNATURE, "image/jp2"),
+    (J2K_SIGNATURE, "image/x-jp2-codestream"),
+)
+
+# TIFF tags and field types
+TIFF_IMAGE_WIDTH = 256
+TIFF_IMAGE_LENGTH = 257
+TIFF_FIELD_FORMATS = {3: "H", 4: "I", 16: "Q"}
+
+# JPEG start-of-frame markers (SOF0-SOF15, excluding DHT, JPG and DAC)
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# JPEG markers without a length field
+JPEG_STANDALONE_MARKERS = frozenset(range(0xD0, 0xDA)) | {0x01}
+
+# Upper bound on bytes scanned for JPEG frame headers or JP2 boxes
+MAX_SCAN_BYTES = 16 * 1024 * 1024
+
+
+def _read_exact(fp: BinaryIO, size: int) -> bytes:
+    data = fp.read(size)
+    if len(data) != size:
+        raise ValueError("Unexpected end of file")
+    return data
+
+
+def _tiff_size(fp: BinaryIO, start: int, header: bytes) -> Tuple[int, int]:
+    """Reads the width and height tags from the first IFD of a (Big)TIFF."""
+    endian = "<" if header[:2] == TIFF_LE else ">"
+    (version,) = struct.unpack(endian + "H", header[2:4])
+    if version == 42:
+        (ifd_offset,) = struct.unpack(endian + "I", header[4:8])
+        # IFD entry count format, entry size, and offset of an entry's value
+        count_format, entry_size, value_offset = "H", 12, 8
+    elif version == 43:
+        (ifd_offset,) = struct.unpack(endian + "Q", header[8:16])
+        count_format, entry_size, value_offset = "Q", 20, 12
+    else:
+        raise ValueError(f"Unknown TIFF version {version}")
+
+    fp.seek(start + ifd_offset)
+    count_size = struct.calcsize(count_format)
+    (entries,) = struct.unpack(endian + count_format, _read_exact(fp, count_size))
+    ifd = _read_exact(fp, entries * entry_size)
+
+    size = {}
+    for offset in range(0, len(ifd), entry_size):
+        tag, field_type = struct.unpack_from(endian + "HH", ifd, offset)
+        if tag in (TIFF_IMAGE_WIDTH, TIFF_IMAGE_LENGTH):
+            field_format = TIFF_FIELD_FORMATS.get(field_type)
+            if not field_format:
+                raise ValueError(f"Unexpected TIFF field type {field_type}")
+            (size[tag],) = struct.unpack_from(
+                endian + field_format, ifd, offset + value_offset
+            )
+            if len(size) == 2:
+                return size[TIFF_IMAGE_WIDTH], size[TIFF_IMAGE_LENGTH]
+    raise ValueError("TIFF dimensions not found")
+
+
+def _jpeg_size(fp: BinaryIO, start: int) -> Tuple[int, int]:
+    """Skips JPEG segments until the start-of-frame header."""
+    fp.seek(start + 2)
+    while fp.tell() - start < MAX_SCAN_BYTES:
+        byte = _read_exact(fp, 1)
+        if byte != b"\xff":
+            continue
+        marker = b"\xff"
+        while marker == b"\xff":  # skip fill bytes
+            marker = _read_exact(fp, 1)
+        marker = marker[0]
+        if marker in JPEG_STANDALONE_MARKERS or marker == 0:
+            continue
+        (length,) = struct.unpack(">H", _read_exact(fp, 2))
+        if marker in JPEG_SOF_MARKERS:
+            _, height, width = struct.unpack(">BHH", _read_exact(fp, 5))
+            return width, height
+        fp.seek(length - 2, os.SEEK_CUR)
+    raise ValueError("JPEG frame header not found")
+
+
+def _jp2_boxes(fp: BinaryIO, end: Optional[int] = None):
+    """Yields (type, content offset, content end) for JP2 boxes from `fp`."""
+    position = fp.tell()
+    while end is None or position < end:
+        header = fp.read(8)
+        if len(header) < 8:
+            return
+        length, box_type = struct.unpack(">I4s", header)
+        content = position + 8
+        if length == 1:
+            (length,) = struct.unpack(">Q", _read_exact(fp, 8))
+            content += 8
+        box_end = position + length if length else end
+        yield box_type, content, box_end
+        if box_end is None:
+            return
+        position = box_end
+        fp.seek(position)
+
+
+def _jp2_size(fp: BinaryIO, start: int) -> Tuple[int, int]:
+    """Reads the image header box from the JP2 header superbox."""
+    fp.seek(start + len(JP2_SIGNATURE))
+    for box_type, content, box_end in _jp2_boxes(fp):
+        if content - start > MAX_SCAN_BYTES:
+            break
+        if box_type == b"jp2h":
+            fp.seek(content)
+            for inner_type, inner_content, _ in _jp2_boxes(fp, box_end):
+                if inner_type == b"ihdr":
+                    fp.seek(inner_content)
+                    height, width = struct.unpack(">II", _read_exact(fp, 8))
+                    return width, height
+            break
+    raise ValueError("JP2 image header not found")
+
+
+def _j2k_size(fp: BinaryIO, start: int) -> Tuple[int, int]:
+    """Reads the image size (SIZ) segment of a raw JPEG 2000 codestream."""
+    fp.seek(start + 8)
+    xsiz, ysiz, xosiz, yosiz = struct.unpack(">IIII", _read_exact(fp, 16))
+    return xsiz - xosiz, ysiz - yosiz
+
+
+def _read_size(fp: BinaryIO) -> Optional[Tuple[int, int]]:
+    start = fp.tell()
+    header = fp.read(HEADER_SIZE)
+    if header[:2] in (TIFF_LE, TIFF_BE):
+        return _tiff_size(fp, start, header)
+    if header[:2] == JPEG_SOI:
+        return _jpeg_size(fp, start)
+    if header[:8] == PNG_SIGNATURE and header[12:16] == b"IHDR":
+        return struct.unpack(">II", header[16:24])
+    if header[:12] == JP2_SIGNATURE:
+        return _jp2_size(fp, start)
+    if header[:4] == J2K_SIGNATURE:
+        return _j2k_size(fp, start)
+    return None
+
+
+def read_image_size(file: Union[str, BinaryIO]) -> Optional[Tuple[int, int]]:
+    """
+    Reads the width and height of a TIFF, JPEG, PNG or JPEG 2000 image from its
+    header. File can be a file path or a file-like object positioned at the
+    start of the image; the position is restored afterwards. Returns None if
+    the format is not recognized or the header cannot be parsed.
+    """
+    try:
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "rb") as fp:
+                return _read_size(fp)
+        position = file.tell()
+        try:
+            return _read_size(file)
+        finally:
+            file.seek(position)
+    except (ValueError, struct.error):
+        return None
+
+
+def sniff_mime_type(header: bytes) -> Optional[str]:
+    """
+    Returns the MIME type of a TIFF, JPEG, PNG or JPEG 2000 image from the
+    leading bytes of the file, or None if the signature is not recognized.
+    """
+    for signature, mime_type in MIME_TYPES:
+        if header.startswith(signature):
+            return mime_type
+    return None
@@ -0,0 +1,10 @@
+"""
+IIIF Presentation 3.0 JSON schema used by `generate_manifest.validateManifest`.
+
+`iiif_3_0.json` follows `schema/iiif_3_0.json` of the IIIF presentation
+validator, https://github.com/IIIF/presentation-validator, which is released
+under the Apache License 2.0. To update it, replace it with the upstream file:
+
+    curl -o src/IIIFingest/schema/iiif_3_0.json \
+        https://raw.githubusercontent.com/IIIF/presentation-validator/master/schema/iiif_3_0.json
+"""
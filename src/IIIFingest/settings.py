@@ -47,3 +47,48 @@ MPS_QA_INGEST_SERVICE_STATUS = (
 MPS_PROD_INGEST_SERVICE_STATUS = (
     "https://mps-ingest.lib.harvard.edu/admin/ingest/version"
 )
+
+# Worker pool types used for concurrent uploads
+VALID_EXECUTORS = ("thread", "process")
+
+# Default S3 transfer profile: objects larger than the threshold are sent as
+# multipart uploads in parts of MULTIPART_CHUNKSIZE bytes, with up to
+# MULTIPART_MAX_CONCURRENCY parts in flight. Checksums are computed by reading
+# HASH_CHUNKSIZE bytes at a time.
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+MULTIPART_MAX_CONCURRENCY = 10
+HASH_CHUNKSIZE = 1024 * 1024
+
+# Default size of the HTTP connection pool of each cached S3 client
+S3_MAX_POOL_CONNECTIONS = 50
+
+# HTTP settings for MPS ingest API calls: timeouts in seconds, and the number of
+# keep-alive connections pooled per host
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_READ_TIMEOUT = 60
+HTTP_POOL_MAXSIZE = 10
+
+# Large ingests are split into requests of at most INGEST_CHUNK_ASSETS assets and
+# about INGEST_CHUNK_BYTES of JSON, with up to INGEST_WORKERS sent concurrently
+INGEST_CHUNK_ASSETS = 1000
+INGEST_CHUNK_BYTES = 5 * 1024 * 1024
+INGEST_WORKERS = 4
+
+# Compression level used when gzipping large ingest request bodies
+GZIP_COMPRESSLEVEL = 6
+
+# Job status polling: the first delay between polls, the factor it grows by
+# after each poll, the longest delay, and the random spread applied to each delay
+JOB_POLL_INITIAL_INTERVAL = 1
+JOB_POLL_BACKOFF = 2
+JOB_POLL_MAX_INTERVAL = 60
+JOB_POLL_JITTER = 0.1
+# Longest time in seconds that pingJob and iterJobStatus wait for a job by
+# default, about as long as 25 polls 10 seconds apart
+JOB_POLL_DEADLINE = 250
+
+# Client.run_pipeline: threads probing images, and the number of items held in
+# each queue between stages
+PIPELINE_PROBE_WORKERS = 4
+PIPELINE_QUEUE_SIZE = 64
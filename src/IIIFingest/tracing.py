@@ -0,0 +1,155 @@
+import argparse
+import json
+import math
+import os
+import threading
+from contextlib import contextmanager
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Union
+
+# Stages timed in trace records; each has `{stage}_start` and `{stage}_end`
+# fields holding Unix timestamps in seconds
+TRACE_STAGES = ("probe", "upload", "ingest")
+TRACE_PERCENTILES = (50, 95, 99)
+
+
+class TraceWriter:
+    """
+    Appends per-asset trace records to a JSON Lines file, one record per line.
+    Each record is flushed as it is written, so a trace can be inspected while
+    a batch is still running. Safe to share between threads.
+
+    `Client.upload` writes a record per asset with its `asset_id`, `s3key`,
+    `bytes` and the start and end times of the `probe` and `upload` stages;
+    `Client.ingest` writes a record per asset with the start and end times of
+    the `ingest` request that included it and that request's `job_id`. The
+    record of an asset whose probe or upload failed has an `error` and the
+    times up to the failure.
+    """
+
+    def __init__(self, output: Union[str, os.PathLike, IO[str]]):
+        if isinstance(output, (str, os.PathLike)):
+            self._fp = open(output, "a", encoding="utf-8")
+            self._owns_fp = True
+        else:
+            self._fp = output
+            self._owns_fp = False
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._fp.write(line)
+            self._fp.flush()
+
+    def close(self):
+        """Closes the file if it was opened by the writer."""
+        if self._owns_fp:
+            self._fp.close()
+
+    def __enter__(self) -> "TraceWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@contextmanager
+def open_trace(
+    trace: Optional[Union[str, os.PathLike, TraceWriter]]
+) -> Iterator[Optional[TraceWriter]]:
+    """
+    Yields `trace` as a `TraceWriter`, or None if it is None. A path is opened
+    for appending and closed on exit; a writer is passed through as is.
+    """
+    if trace is None or isinstance(trace, TraceWriter):
+        yield trace
+        return
+    with TraceWriter(trace) as writer:
+        yield writer
+
+
+def read_trace(path: Union[str, os.PathLike]) -> Iterator[dict]:
+    """Yields the records of a trace file, skipping blank lines."""
+    with open(path, encoding="utf-8") as fp:
+        for line in fp:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    """Nearest-rank percentile of sorted `values`."""
+    rank = max(1, math.ceil(percentile / 100 * len(values)))
+    return values[rank - 1]
+
+
+def analyze_trace(records: Iterable[dict], top: int = 10) -> dict:
+    """
+    Summarizes trace records. Records are merged by `asset_id`, and each
+    asset's time in a stage is its end minus start time. Returns, per stage,
+    the number of assets and the p50, p95, p99 and max durations in seconds,
+    and the `top` slowest assets by their total time across all stages.
+    """
+    assets: Dict[str, dict] = {}
+    for record in records:
+        asset = assets.setdefault(record.get("asset_id"), {})
+        asset.update(record)
+
+    durations: Dict[str, List[float]] = {stage: [] for stage in TRACE_STAGES}
+    totals = []
+    for asset_id, asset in assets.items():
+        asset_durations = {}
+        for stage in TRACE_STAGES:
+            start, end = asset.get(f"{stage}_start"), asset.get(f"{stage}_end")
+            if start is not None and end is not None:
+                asset_durations[stage] = end - start
+                durations[stage].append(end - start)
+        totals.append(
+            {
+                "asset_id": asset_id,
+                "s3key": asset.get("s3key"),
+                "bytes": asset.get("bytes"),
+                "seconds": sum(asset_durations.values()),
+                **{f"{stage}_seconds": d for stage, d in asset_durations.items()},
+            }
+        )
+
+    stages = {}
+    for stage, values in durations.items():
+        if not values:
+            continue
+        values.sort()
+        stages[stage] = {
+            "count": len(values),
+            **{f"p{p}": _percentile(values, p) for p in TRACE_PERCENTILES},
+            "max": values[-1],
+        }
+    totals.sort(key=lambda asset: asset["seconds"], reverse=True)
+    return {"assets": len(assets), "stages": stages, "slowest": totals[:top]}
+
+
+def format_report(summary: dict) -> str:
+    """Formats the result of `analyze_trace` as a plain text report."""
+    lines = [f"{summary['assets']} assets"]
+    header = "".join(f"{f'p{p}':>10}" for p in TRACE_PERCENTILES)
+    lines.append(f"{'stage':<8}{'count':>8}{header}{'max':>10}")
+    for stage, stats in summary["stages"].items():
+        values = "".join(f"{stats[f'p{p}']:>10.3f}" for p in TRACE_PERCENTILES)
+        lines.append(f"{stage:<8}{stats['count']:>8}{values}{stats['max']:>10.3f}")
+    if summary["slowest"]:
+        lines.append("")
+        lines.append("slowest assets (seconds, bytes, asset_id, s3key)")
+        for asset in summary["slowest"]:
+            lines.append(
+                f"{asset['seconds']:10.3f} {asset['bytes'] or '-':>12} "
+                f"{asset['asset_id']} {asset['s3key'] or '-'}"
+            )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize an ingest trace file")
+    parser.add_argument("trace", help="JSON Lines trace file")
+    parser.add_argument("--top", "-n", type=int, default=10, help="slowest assets")
+    args = parser.parse_args()
+
+    print(format_report(analyze_trace(read_trace(args.trace), top=args.top)))
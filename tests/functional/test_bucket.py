@@ -73,5 +73,5 @@ class TestFunctionalBucket:
 
     def test_functional_fail_upload_directory(self):
         bucket = "doesnotexist"
-        with pytest.raises(ClientError):
-            assert upload_directory(self.image_dir_path, bucket, self.s3_path)
+        results = upload_directory(self.image_dir_path, bucket, self.s3_path)
+        assert all(isinstance(result.error, ClientError) for result in results)
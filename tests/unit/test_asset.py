@@ -1,5 +1,6 @@
 import mimetypes
 import os.path
+import pickle
 
 import pytest
 
@@ -156,3 +157,40 @@ def test_asset_upload_by_fileobj(test_images, mocker):
         actual_s3_key = asset.upload(bucket_name="ingestbucket", s3_path=s3_path)
 
     assert actual_s3_key == expected_s3_key
+
+
+@pytest.mark.parametrize("executor", ["process", "thread"])
+def test_create_assets_from_files(test_images, tmp_path, executor):
+    bad_path = tmp_path / "notanimage.tif"
+    bad_path.write_bytes(b"not an image")
+    filepaths = [image["filepath"] for image in test_images.values()]
+    filepaths.insert(2, str(bad_path))
+    metadata = [{"label": "Test", "value": "Image level metadata"}]
+
+    results = Asset.from_files(
+        filepaths, workers=2, executor=executor, metadata=metadata
+    )
+
+    assert [result.filepath for result in results] == filepaths
+    bad_result = results.pop(2)
+    assert not bad_result.ok
+    assert bad_result.asset is None
+    for result, test_image in zip(results, test_images.values()):
+        assert result.ok
+        assert result.asset.filepath == test_image["filepath"]
+        assert result.asset.width == test_image["width"]
+        assert result.asset.height == test_image["height"]
+        assert result.asset.format == test_image["format"]
+        assert result.asset.metadata == metadata
+
+
+def test_asset_is_slotted():
+    asset = Asset(asset_id="myapp1234", width=10, height=20)
+
+    assert not hasattr(asset, "__dict__")
+    with pytest.raises(AttributeError):
+        asset.unknown = True
+
+    copy = pickle.loads(pickle.dumps(asset))
+    assert copy.to_dict() == asset.to_dict()
+    assert str(copy) == "Asset: " + str(sorted(asset.to_dict().items()))
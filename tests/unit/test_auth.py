@@ -1,5 +1,6 @@
 import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from unittest import mock
 
@@ -124,3 +125,59 @@ def test_make_jwt(mocker):
     actual_jwt = creds.make_jwt()
 
     assert actual_jwt == expected_jwt
+
+
+def test_make_jwt_cached(mocker):
+    creds = Credentials(
+        issuer="atdarth",
+        kid="atdarthdefault",
+        algorithm="HS256",
+        expiration=3600,
+        refresh_margin=60,
+        private_key_string="secret",
+    )
+    mock_monotonic = mocker.patch('IIIFingest.auth.time.monotonic', return_value=0)
+
+    token = creds.make_jwt()
+    assert creds.make_jwt() == token
+    assert (creds.cache_hits, creds.cache_misses) == (1, 1)
+
+    # Other resources get their own token
+    creds.make_jwt(resources=["content"])
+    assert creds.cache_misses == 2
+
+    # Reissued once the token is within the refresh margin of expiring
+    mock_monotonic.return_value = 3600 - 60
+    creds.make_jwt()
+    assert (creds.cache_hits, creds.cache_misses) == (1, 3)
+
+
+def test_make_jwt_cache_disabled():
+    creds = Credentials(
+        issuer="atdarth",
+        kid="atdarthdefault",
+        algorithm="HS256",
+        private_key_string="secret",
+        cache_tokens=False,
+    )
+
+    creds.make_jwt()
+    creds.make_jwt()
+
+    assert (creds.cache_hits, creds.cache_misses) == (0, 0)
+
+
+def test_make_jwt_cache_threads():
+    creds = Credentials(
+        issuer="atdarth",
+        kid="atdarthdefault",
+        algorithm="HS256",
+        private_key_string="secret",
+    )
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        tokens = set(pool.map(lambda _: creds.make_jwt(), range(100)))
+
+    assert len(tokens) == 1
+    assert creds.cache_misses == 1
+    assert creds.cache_hits == 99
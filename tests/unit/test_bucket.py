@@ -1,9 +1,20 @@
+import base64
+import gc
+import hashlib
+import io
+import os
+import weakref
+
+import boto3
 import pytest
 from boto3.exceptions import S3UploadFailedError
 from botocore.exceptions import ClientError
 from moto import mock_s3
 
 from IIIFingest.bucket import (
+    S3ClientCache,
+    create_transfer_config,
+    md5_fileobj,
     upload_directory,
     upload_image_by_fileobj,
     upload_image_by_filepath,
@@ -49,6 +60,92 @@ class TestBucket:
         # Verify output of upload function
         assert image_s3_key == self.key
 
+    @pytest.mark.parametrize("use_threads", [True, False])
+    def test_upload_image_by_fileobj_multipart(self, boto_session, mocker, use_threads):
+        """
+        Objects above the multipart threshold should be uploaded in parts and
+        arrive intact.
+        """
+        part_size = 5 * 1024 * 1024
+        transfer_config = create_transfer_config(
+            multipart_threshold=part_size,
+            part_size=part_size,
+            max_concurrency=2,
+            use_threads=use_threads,
+        )
+        s3 = boto_session.client('s3')
+        s3.create_bucket(Bucket=self.test_bucket_name)
+        data = os.urandom(2 * part_size + 1024)
+        create_spy = mocker.spy(s3, 'create_multipart_upload')
+
+        image_s3_key = upload_image_by_fileobj(
+            io.BytesIO(data),
+            self.file_name,
+            self.test_bucket_name,
+            s3_path,
+            s3_client=s3,
+            transfer_config=transfer_config,
+        )
+
+        assert image_s3_key == self.key
+        assert create_spy.call_count == 1
+        body = s3.get_object(Bucket=self.test_bucket_name, Key=self.key)["Body"]
+        assert body.read() == data
+
+    def test_upload_image_by_fileobj_multipart_small_parts(self, boto_session, mocker):
+        """
+        Part sizes below the S3 minimum should be raised to it, as they are
+        when uploading by filepath.
+        """
+        transfer_config = create_transfer_config(
+            multipart_threshold=1024 * 1024, part_size=1024 * 1024
+        )
+        s3 = boto_session.client('s3')
+        s3.create_bucket(Bucket=self.test_bucket_name)
+        data = os.urandom(6 * 1024 * 1024)
+        part_spy = mocker.spy(s3, 'upload_part')
+
+        upload_image_by_fileobj(
+            io.BytesIO(data),
+            self.file_name,
+            self.test_bucket_name,
+            s3_path,
+            s3_client=s3,
+            transfer_config=transfer_config,
+        )
+
+        assert part_spy.call_count == 2
+        body = s3.get_object(Bucket=self.test_bucket_name, Key=self.key)["Body"]
+        assert body.read() == data
+
+    def test_upload_image_by_filepath_transfer_config(
+        self, test_images, boto_session, mocker
+    ):
+        image_path = test_images[self.file_name]["filepath"]
+        s3 = boto_session.client('s3')
+        s3.create_bucket(Bucket=self.test_bucket_name)
+        upload_spy = mocker.spy(s3, 'upload_file')
+        transfer_config = create_transfer_config(max_concurrency=3)
+
+        upload_image_by_filepath(
+            image_path,
+            self.test_bucket_name,
+            s3_path,
+            s3_client=s3,
+            transfer_config=transfer_config,
+        )
+
+        assert upload_spy.call_args[1]["Config"] is transfer_config
+
+    def test_md5_fileobj(self):
+        data = os.urandom(3000)
+        fileobj = io.BytesIO(data)
+        fileobj.seek(100)
+        expected = base64.b64encode(hashlib.md5(data).digest()).decode('utf-8')
+
+        assert md5_fileobj(fileobj, chunk_size=1024) == expected
+        assert fileobj.tell() == 0
+
     def test_fail_upload_image_by_fileobj(self, test_images):
         """
         This tests to make sure that an upload fails when the bucket is not
@@ -83,10 +180,56 @@ class TestBucket:
     def test_upload_directory(self, images_dir, boto_session):
         boto_session.resource('s3').create_bucket(Bucket=self.test_bucket_name)
         upload_directory_response = upload_directory(
-            images_dir, self.test_bucket_name, s3_path
+            images_dir, self.test_bucket_name, s3_path, max_workers=4
         )
         assert upload_directory_response is not False
 
+        expected_files = sorted(os.listdir(images_dir))
+        assert sorted(r.key for r in upload_directory_response) == [
+            f"{s3_path}{name}" for name in expected_files
+        ]
+        for result in upload_directory_response:
+            assert result.ok
+            assert result.bytes == os.path.getsize(result.filepath)
+            assert result.duration >= 0
+
     def test_fail_upload_directory(self, images_dir):
-        with pytest.raises(ClientError):
-            assert upload_directory(images_dir, self.test_bucket_name, s3_path)
+        """
+        A missing bucket should be reported per file rather than aborting the
+        whole directory upload.
+        """
+        results = upload_directory(images_dir, self.test_bucket_name, s3_path)
+        assert len(results) == len(os.listdir(images_dir))
+        for result in results:
+            assert not result.ok
+            assert isinstance(result.error, ClientError)
+
+
+def test_s3_client_cache(boto_session):
+    cache = S3ClientCache(max_pool_connections=20)
+
+    client = cache.get_client(boto_session)
+
+    assert cache.get_client(boto_session) is client
+    assert client.meta.config.max_pool_connections == 20
+    assert cache.get_client(boto_session, max_pool_connections=5) is not client
+
+    cache.clear()
+    assert cache.get_client(boto_session) is not client
+
+
+def test_s3_client_cache_releases_dropped_sessions():
+    cache = S3ClientCache()
+    session = boto3.Session(
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+        region_name="us-east-1",
+    )
+    client = weakref.ref(cache.get_client(session))
+    assert client() is not None
+
+    del session
+    gc.collect()
+
+    assert client() is None
+    assert len(cache._clients) == 0
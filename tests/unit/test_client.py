@@ -1,10 +1,20 @@
+import io
+import json
 import os.path
+import threading
 
 import pytest
+import requests
+from boto3.exceptions import S3UploadFailedError
 from botocore.exceptions import ClientError
 from moto import mock_s3
 
+import IIIFingest.client
+from IIIFingest.asset import Asset
+from IIIFingest.ingest import serializeJson
+from IIIFingest.metrics import InMemoryMetrics, set_metrics
 from IIIFingest.settings import MPS_ASSET_BASE_URL, MPS_MANIFEST_BASE_URL
+from IIIFingest.tracing import TraceWriter, read_trace
 
 
 @mock_s3
@@ -100,6 +110,214 @@ class TestClient:
         assert image_dict.asset_id == f"{client.asset_prefix}{test_image_id}"
         assert image_dict.label == "Test Image"
 
+    def test_client_upload_concurrent_preserves_order(
+        self, test_images, boto_session, test_client
+    ):
+        boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
+
+        client = test_client
+        images = [
+            {"label": name, "filepath": image["filepath"], "id": f"id{idx}"}
+            for idx, (name, image) in enumerate(test_images.items())
+        ]
+        assets = client.upload(images, s3_path="testing", max_workers=4)
+
+        assert [asset.label for asset in assets] == [i["label"] for i in images]
+        assert [asset.filepath for asset in assets] == [i["filepath"] for i in images]
+        for asset, image in zip(assets, images):
+            assert asset.s3key == f"testing/{os.path.basename(image['filepath'])}"
+
+    def test_client_upload_trace(
+        self, test_images, boto_session, test_client, tmp_path
+    ):
+        boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
+
+        images = [
+            {"label": name, "filepath": image["filepath"]}
+            for name, image in list(test_images.items())[:3]
+        ]
+        trace = tmp_path / "trace.jsonl"
+        assets = test_client.upload(
+            images, s3_path="testing", max_workers=2, trace=trace
+        )
+
+        records = list(read_trace(trace))
+        assert [r["asset_id"] for r in records] == [a.asset_id for a in assets]
+        assert [r["s3key"] for r in records] == [a.s3key for a in assets]
+        for record, image in zip(records, images):
+            assert record["bytes"] == os.path.getsize(image["filepath"])
+            assert record["probe_start"] <= record["probe_end"]
+            assert record["probe_end"] <= record["upload_start"]
+            assert record["upload_start"] <= record["upload_end"]
+
+    @pytest.mark.parametrize("max_workers", [1, 2])
+    def test_client_upload_trace_failure(
+        self, test_images, boto_session, test_client, tmp_path, max_workers
+    ):
+        # No bucket, so the upload fails
+        image = test_images["27.586.1-cm-2016-02-09.tif"]
+        images = [{"label": "Test Image", "filepath": image["filepath"]}]
+        trace = tmp_path / "trace.jsonl"
+
+        with pytest.raises(S3UploadFailedError) as excinfo:
+            test_client.upload(images, max_workers=max_workers, trace=trace)
+
+        records = list(read_trace(trace))
+        assert records == [excinfo.value.trace_record]
+        record = records[0]
+        assert record["error"] == repr(excinfo.value)
+        assert record["s3key"] is None
+        assert record["probe_start"] <= record["probe_end"]
+        assert record["probe_end"] <= record["upload_start"]
+        assert record["upload_start"] <= record["upload_end"]
+
+    def test_client_run_pipeline(self, test_images, boto_session, test_client, mocker):
+        boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
+        client = test_client
+        mocker.patch.object(client.jwt_creds, 'make_jwt', return_value="token")
+        ingest_response = mocker.Mock(status_code=200, text="")
+        ingest_response.json.return_value = {
+            "data": {"job_tracker_file": {"_id": "job123"}}
+        }
+        post = mocker.patch.object(
+            client.http_session, 'post', return_value=ingest_response
+        )
+        job_response = mocker.Mock()
+        job_response.json.return_value = {"data": {"job_status": "success"}}
+        mocker.patch.object(client.http_session, 'get', return_value=job_response)
+
+        images = [
+            {"label": name, "filepath": image["filepath"], "id": f"id{idx}"}
+            for idx, (name, image) in enumerate(test_images.items())
+        ]
+        result = client.run_pipeline(
+            iter(images),
+            self.manifest_level_metadata,
+            s3_path="testing",
+            probe_workers=2,
+            upload_workers=3,
+            queue_size=1,
+            wait=True,
+        )
+
+        assert result.ok
+        assert [asset.label for asset in result.assets] == [i["label"] for i in images]
+        assert [list(item["label"].values()) for item in result.manifest["items"]] == [
+            [[i["label"]]] for i in images
+        ]
+        body = json.loads(post.call_args[1]["data"])
+        assert [a["identifier"] for a in body["assets"]["image"]] == [
+            f"{client.namespace}:{asset.asset_id}" for asset in result.assets
+        ]
+        assert body["manifest"] == result.manifest
+        assert result.ingest["job_id"] == "job123"
+        assert result.jobs["job123"].completed
+        assert list(result.stages) == [
+            "probe",
+            "upload",
+            "assemble",
+            "manifest",
+            "ingest",
+            "jobstatus",
+        ]
+        assert result.stages["upload"].workers == 3
+        assert all(
+            stats.items == len(images)
+            for name, stats in result.stages.items()
+            if name != "jobstatus"
+        )
+
+    def test_client_run_pipeline_cancel(
+        self, test_images, boto_session, test_client, mocker
+    ):
+        boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
+        post = mocker.patch.object(test_client.http_session, 'post')
+        cancel = threading.Event()
+        cancel.set()
+
+        images = [
+            {"label": name, "filepath": image["filepath"]}
+            for name, image in test_images.items()
+        ]
+        result = test_client.run_pipeline(
+            images, self.manifest_level_metadata, cancel=cancel
+        )
+
+        assert result.cancelled
+        assert not result.ok
+        assert result.assets == []
+        assert result.manifest is None and result.ingest is None
+        post.assert_not_called()
+
+    def test_client_run_pipeline_cancel_in_progress(
+        self, test_images, boto_session, test_client, mocker
+    ):
+        bucket = boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
+        post = mocker.patch.object(test_client.http_session, 'post')
+        cancel = threading.Event()
+
+        def images():
+            for idx, (name, image) in enumerate(test_images.items()):
+                # Cancel while the first three images are in flight
+                if idx == 3:
+                    cancel.set()
+                yield {"label": name, "filepath": image["filepath"]}
+
+        result = test_client.run_pipeline(
+            images(),
+            self.manifest_level_metadata,
+            upload_workers=3,
+            queue_size=2,
+            cancel=cancel,
+        )
+
+        assert result.cancelled
+        uploaded = sorted(obj.key for obj in bucket.objects.all())
+        assert len(uploaded) == 3
+        assert sorted(asset.s3key for asset in result.assets) == uploaded
+        assert result.stages["upload"].items == len(result.assets)
+        post.assert_not_called()
+
+    def test_client_upload_reuses_s3_client(
+        self, test_images, boto_session, test_client, mocker
+    ):
+        boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
+        image_path = test_images["27.586.1-cm-2016-02-09.tif"]["filepath"]
+        images = [{"label": "Test Image", "filepath": image_path}]
+        client_spy = mocker.spy(boto_session, 'client')
+
+        test_client.upload(images, s3_path="testing")
+        test_client.upload(images, s3_path="testing")
+
+        assert client_spy.call_count == 1
+
+    def test_client_upload_process_executor(
+        self, test_images, boto_session, test_client
+    ):
+        boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
+
+        client = test_client
+        client.upload_executor = "process"
+        images = [
+            {"label": name, "filepath": image["filepath"]}
+            for name, image in list(test_images.items())[:3]
+        ]
+        assets = client.upload(images, s3_path="testing", max_workers=2)
+
+        assert [asset.label for asset in assets] == [i["label"] for i in images]
+        assert all(asset.s3key.startswith("testing/") for asset in assets)
+
+    def test_client_fail_upload_process_executor_fileobj(
+        self, test_images, test_client
+    ):
+        client = test_client
+        client.upload_executor = "process"
+        image_path = test_images["27.586.1-cm-2016-02-09.tif"]["filepath"]
+        with open(image_path, "rb") as fileobj:
+            images = [{"label": "Test Image", "fileobj": fileobj}]
+            with pytest.raises(ValueError):
+                client.upload(images, s3_path="testing")
+
     def test_client_fail_upload_non_alphanumeric_asset_id(
         self, test_images, boto_session, test_client
     ):
@@ -162,9 +380,135 @@ class TestClient:
         assert manifest_body["id"].startswith(manually_created_base_asset_url)
         assert manifest_body["format"] == assets[0].format
 
+    def test_client_create_manifest_fast_matches_pyiiifpres(
+        self, test_images, boto_session, test_client
+    ):
+        boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
+        client = test_client
+        images = [
+            {"label": name, "filepath": image["filepath"]}
+            for name, image in test_images.items()
+        ]
+        assets = client.upload(images, s3_path="testing")
+        manifest_level_metadata = dict(
+            self.manifest_level_metadata,
+            metadata=[{"label": "Creator", "value": "Unknown"}],
+        )
+
+        fast_manifest = client.create_manifest(
+            manifest_level_metadata, assets, manifest_name="TEST1", fast=True
+        )
+        manifest = client.create_manifest(
+            manifest_level_metadata, assets, manifest_name="TEST1"
+        )
+
+        assert fast_manifest == manifest
+        assert len(fast_manifest["items"]) == len(images)
+
+    @pytest.mark.parametrize(
+        "invalid",
+        [{"rights": "not a url"}, {"behaviors": ["paged", "individuals"]}],
+    )
+    def test_client_create_manifest_checks_by_default(
+        self, boto_session, test_client, invalid
+    ):
+        assets = [Asset(asset_id="ASSET1", s3key="testing/1.tif", width=1, height=1)]
+        manifest_level_metadata = dict(self.manifest_level_metadata, **invalid)
+
+        with pytest.raises(AssertionError):
+            test_client.create_manifest(manifest_level_metadata, assets)
+
+    def test_client_create_manifest_output(
+        self, test_images, boto_session, test_client, tmp_path
+    ):
+        boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
+        client = test_client
+        images = [
+            {"label": name, "filepath": image["filepath"]}
+            for name, image in test_images.items()
+        ]
+        assets = client.upload(images, s3_path="testing")
+        output = tmp_path / "manifest.json"
+
+        result = client.create_manifest(
+            self.manifest_level_metadata,
+            iter(assets),
+            manifest_name="TEST1",
+            output=output,
+        )
+        manifest = client.create_manifest(
+            self.manifest_level_metadata, assets, manifest_name="TEST1"
+        )
+
+        assert result == {"id": manifest["id"], "canvases": len(images)}
+        assert json.loads(output.read_text()) == manifest
+
+    def test_client_create_manifest_validate(
+        self, test_images, boto_session, test_client, mocker
+    ):
+        boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
+        client = test_client
+        image_path = test_images["27.586.1-cm-2016-02-09.tif"]["filepath"]
+        assets = client.upload([{"label": "Test Image", "filepath": image_path}])
+        validate = mocker.spy(IIIFingest.client, "validateManifest")
+
+        manifest = client.create_manifest(
+            self.manifest_level_metadata, assets, validate=True
+        )
+
+        validate.assert_called_once_with(manifest)
+        with pytest.raises(ValueError):
+            client.create_manifest(
+                self.manifest_level_metadata,
+                assets,
+                output=io.StringIO(),
+                validate=True,
+            )
+
+    def test_client_update_manifest(self, test_images, boto_session, test_client):
+        boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
+        client = test_client
+        images = [
+            {"label": name, "filepath": image["filepath"]}
+            for name, image in test_images.items()
+        ]
+        assets = client.upload(images, s3_path="testing")
+        manifest = client.create_manifest(
+            self.manifest_level_metadata, assets, manifest_name="TEST1"
+        )
+        expected = client.create_manifest(
+            self.manifest_level_metadata, assets[1:], manifest_name="TEST1"
+        )
+
+        result = client.update_manifest(
+            manifest, assets=assets[1:], remove=[assets[0].asset_id]
+        )
+
+        assert result == {"added": 0, "replaced": len(assets) - 1, "removed": 1}
+        assert manifest == expected
+
+    def test_client_records_metrics(self, test_images, boto_session, test_client):
+        boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
+        client = test_client
+        image_path = test_images["27.586.1-cm-2016-02-09.tif"]["filepath"]
+        metrics = set_metrics(InMemoryMetrics())
+        try:
+            assets = client.upload([{"label": "Test Image", "filepath": image_path}])
+            client.create_manifest(self.manifest_level_metadata, assets)
+        finally:
+            set_metrics(None)
+
+        labels = {"source": "filepath"}
+        assert metrics.histogram("iiifingest_s3_upload_seconds", labels).count == 1
+        assert metrics.counter("iiifingest_s3_upload_bytes_total") == os.path.getsize(
+            image_path
+        )
+        assert metrics.counter("iiifingest_s3_uploads_total", {"result": "ok"}) == 1
+        labels = {"mode": "pyiiifpres"}
+        assert metrics.histogram("iiifingest_manifest_build_seconds", labels).count == 1
+
     def test_client_fail_create_manifest_missing_asset(self, boto_session, test_client):
         with pytest.raises(TypeError):
-
             boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
             client = test_client
             assert client.create_manifest(
@@ -175,10 +519,197 @@ class TestClient:
         self, test_images, boto_session, test_client
     ):
         with pytest.raises(TypeError):
-
             boto_session.resource('s3').create_bucket(Bucket=self.bucket_name)
             client = test_client
             image_path = test_images["27.586.1-cm-2016-02-09.tif"]["filepath"]
             images = [{"label": "Test Image", "filepath": image_path}]
             assets = client.upload(images, s3_path="testing")
             assert client.create_manifest(assets=assets)
+
+    def test_client_servicestatus_uses_http_session(self, test_client, mocker):
+        client = test_client
+        response = mocker.Mock(status_code=200)
+        get = mocker.patch.object(client.http_session, 'get', return_value=response)
+
+        assert client.servicestatus() is True
+        get.assert_called_once_with(
+            client.ingest_service_status_endpoint, timeout=client.timeout
+        )
+
+    def test_client_jobstatus_uses_http_session(self, test_client, mocker):
+        client = test_client
+        response = mocker.Mock()
+        response.json.return_value = {"data": {"job_status": "success"}}
+        get = mocker.patch.object(client.http_session, 'get', return_value=response)
+
+        status = client.jobstatus("job123")
+
+        assert status["completed"] is True
+        get.assert_called_once_with(
+            f"{client.job_endpoint}job123", timeout=client.timeout
+        )
+
+    def test_client_ingest_chunks(self, test_client, mocker):
+        client = test_client
+        client.ingest_chunk_assets = 2
+        mocker.patch.object(client.jwt_creds, 'make_jwt', return_value="token")
+        responses = iter(range(100))
+
+        def post(endpoint, headers, data, timeout):
+            body = json.loads(data)
+            response = mocker.Mock(status_code=200, text="")
+            job_id = f"job{len(body['assets']['image'])}-{next(responses)}"
+            response.json.return_value = {
+                "data": {
+                    "job_tracker_file": {"_id": job_id},
+                    "manifest": body["manifest"],
+                }
+            }
+            return response
+
+        post = mocker.patch.object(client.http_session, 'post', side_effect=post)
+        assets = [
+            Asset(asset_id=f"ASSET{idx}", s3key=f"testing/{idx}.tif", width=1, height=1)
+            for idx in range(5)
+        ]
+        manifest = {"id": "https://example.org/manifest"}
+
+        result = client.ingest(assets, manifest=manifest, max_workers=2)
+
+        bodies = [json.loads(call[1]["data"]) for call in post.call_args_list]
+        assert len(bodies) == 3
+        assert [b["manifest"] for b in bodies] == [{}, {}, manifest]
+        assert [a["identifier"] for a in bodies[-1]["assets"]["image"]] == [
+            "TEST:ASSET3",
+            "TEST:ASSET4",
+        ]
+        assert result["job_id"] == result["job_ids"][-1]
+        assert [job_id.split("-")[0] for job_id in result["job_ids"]] == [
+            "job1",
+            "job2",
+            "job2",
+        ]
+        assert result["data"]["manifest"] == manifest
+        assert result["error"] is None
+        assert len(result["chunks"]) == 3
+
+    def test_client_ingest_serializes_single_request_once(self, test_client, mocker):
+        client = test_client
+        mocker.patch.object(client.jwt_creds, 'make_jwt', return_value="token")
+        serializer = mocker.Mock(side_effect=serializeJson)
+        client.ingest_serializer = serializer
+        chunk = mocker.spy(IIIFingest.client, "chunkIngestAssets")
+        response = mocker.Mock(status_code=200, text="")
+        response.json.return_value = {"data": {"job_tracker_file": {"_id": "job1"}}}
+        post = mocker.patch.object(client.http_session, 'post', return_value=response)
+        assets = [
+            Asset(asset_id=f"ASSET{idx}", s3key=f"testing/{idx}.tif", width=1, height=1)
+            for idx in range(3)
+        ]
+        manifest = {"id": "https://example.org/manifest"}
+
+        result = client.ingest(assets, manifest=manifest)
+
+        assert result["job_ids"] == ["job1"]
+        serializer.assert_called_once()
+        chunk.assert_not_called()
+        body = json.loads(post.call_args[1]["data"])
+        assert body["manifest"] == manifest
+        assert len(body["assets"]["image"]) == 3
+
+        # A request too large for one body is split, sizing with the same serializer
+        client.ingest_chunk_bytes = len(serializeJson(body)) // 2
+        serializer.reset_mock()
+        client.ingest(assets, manifest=manifest)
+        chunk.assert_called_once()
+        assert chunk.call_args[1]["serializer"] is serializer
+        assert post.call_count > 2
+
+    @pytest.mark.parametrize(
+        "failure",
+        [
+            {"error": "Invalid asset"},
+            requests.exceptions.Timeout("timed out"),
+        ],
+    )
+    def test_client_ingest_chunk_failure(self, test_client, mocker, failure):
+        client = test_client
+        client.ingest_chunk_assets = 2
+        mocker.patch.object(client.jwt_creds, 'make_jwt', return_value="token")
+
+        def post(endpoint, headers, data, timeout):
+            body = json.loads(data)
+            first = body["assets"]["image"][0]["identifier"]
+            if first == "TEST:ASSET0":
+                if isinstance(failure, Exception):
+                    raise failure
+                response_data = failure
+            else:
+                response_data = {"data": {"job_tracker_file": {"_id": first}}}
+            response = mocker.Mock(status_code=200, text="")
+            response.json.return_value = response_data
+            return response
+
+        post = mocker.patch.object(client.http_session, 'post', side_effect=post)
+        assets = [
+            Asset(asset_id=f"ASSET{idx}", s3key=f"testing/{idx}.tif", width=1, height=1)
+            for idx in range(5)
+        ]
+
+        result = client.ingest(assets, manifest={"id": "https://example.org/manifest"})
+
+        bodies = [json.loads(call[1]["data"]) for call in post.call_args_list]
+        assert len(bodies) == 2
+        assert all(body["manifest"] == {} for body in bodies)
+        assert result["job_ids"] == ["", "TEST:ASSET1", ""]
+        assert result["error"] == result["chunks"][0]["error"]
+        assert result["error"] is not None
+        assert result["chunks"][2]["error"] is not None
+        assert result["job_id"] == ""
+
+    def test_client_monitor_jobs(self, test_client, mocker):
+        client = test_client
+        response = mocker.Mock()
+        response.json.return_value = {"data": {"job_status": "success"}}
+        get = mocker.patch.object(client.http_session, 'get', return_value=response)
+
+        results = client.monitor_jobs(["job1", "job2"], interval=0).run()
+
+        assert sorted(results) == ["job1", "job2"]
+        assert all(update.completed for update in results.values())
+        get.assert_any_call(f"{client.job_endpoint}job1", timeout=client.timeout)
+
+    def test_client_ingest_trace(self, test_client, mocker):
+        client = test_client
+        client.ingest_chunk_assets = 2
+        mocker.patch.object(client.jwt_creds, 'make_jwt', return_value="token")
+
+        def post(endpoint, headers, data, timeout):
+            body = json.loads(data)
+            first = body["assets"]["image"][0]["identifier"]
+            response = mocker.Mock(status_code=200, text="")
+            response.json.return_value = {"data": {"job_tracker_file": {"_id": first}}}
+            return response
+
+        mocker.patch.object(client.http_session, 'post', side_effect=post)
+        assets = [
+            Asset(asset_id=f"ASSET{idx}", s3key=f"testing/{idx}.tif", width=1, height=1)
+            for idx in range(3)
+        ]
+        output = io.StringIO()
+
+        with TraceWriter(output) as writer:
+            client.ingest(assets, trace=writer)
+
+        records = sorted(
+            (json.loads(line) for line in output.getvalue().splitlines()),
+            key=lambda record: record["asset_id"],
+        )
+        assert [r["asset_id"] for r in records] == ["ASSET0", "ASSET1", "ASSET2"]
+        assert [r["s3key"] for r in records] == [a.s3key for a in assets]
+        assert [r["job_id"] for r in records] == [
+            "TEST:ASSET0",
+            "TEST:ASSET1",
+            "TEST:ASSET1",
+        ]
+        assert all(r["ingest_start"] <= r["ingest_end"] for r in records)
@@ -0,0 +1,285 @@
+import io
+import json
+import sys
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import jsonschema
+import pytest
+from IIIFpres import iiifpapi3
+
+from IIIFingest.generate_manifest import (
+    buildManifest,
+    createManifest,
+    getManifestSchema,
+    getManifestValidator,
+    setManifestSchema,
+    updateManifest,
+    validateManifest,
+    validateManifests,
+    writeManifest,
+)
+
+BASE_URL = "https://nrs-qa.lib.harvard.edu/URN-3:AT:TESTMANIFEST:MANIFEST:3"
+
+
+def make_canvases(count, with_metadata=False):
+    canvases = []
+    for idx in range(count):
+        canvas = {
+            "label": f"Test image {idx}",
+            "height": 564 + idx,
+            "width": 3600,
+            "asset_id": f"TESTASSET{idx}",
+            "id": f"https://mps-qa.lib.harvard.edu/assets/images/AT:TESTASSET{idx}",
+            "service": "/full/max/0/default.tif",
+            "format": "image/tiff",
+            "metadata": [],
+        }
+        if with_metadata:
+            canvas["metadata"] = [
+                {"label": "Reference", "value": f"ID{idx}"},
+                {"label": "Pages", "value": ["1", "2"], "value_lang": "none"},
+            ]
+        canvases.append(canvas)
+    return canvases
+
+
+MANIFEST_KWARGS = [
+    dict(labels=["Simple manifest"]),
+    dict(
+        labels=["First", {"lang": "fr", "label": "Premier"}, "Second"],
+        behaviors=["paged", "auto-advance"],
+        rights="http://creativecommons.org/licenses/by-sa/3.0/",
+        manifest_metadata=[
+            {"label": "Creator", "value": "Unknown"},
+            {"label": "Date", "value": "19th Century", "label_lang": "fr"},
+        ],
+        required_statement=[
+            {"label": "Attribution", "value": "Someone"},
+            {"label": "Held by", "value": "Harvard", "value_lang": "none"},
+        ],
+        providers=[
+            {
+                "id": "https://example.org/about",
+                "labels": [
+                    {"lang": "en", "value": "Harvard"},
+                    {"value": "Library"},
+                ],
+            }
+        ],
+        summary=[{"value": "A summary"}, {"lang": "fr", "value": "Un resume"}],
+        thumbnails=[
+            {"id": "https://example.org/thumb.jpg", "height": 20, "width": "10"}
+        ],
+    ),
+    dict(
+        labels=[{"label": "Default language"}],
+        default_lang="fr",
+        behaviors=[],
+        summary="A string summary",
+        service_type="ImageService3",
+        service_profile="level1",
+    ),
+]
+
+
+@pytest.mark.filterwarnings("ignore")
+@pytest.mark.parametrize("kwargs", MANIFEST_KWARGS)
+@pytest.mark.parametrize("with_metadata", [False, True])
+def test_build_manifest_matches_create_manifest(kwargs, with_metadata):
+    canvases = make_canvases(3, with_metadata=with_metadata)
+    canvases[1]["label"] = {"lang": "en", "value": "Dict label"}
+    canvases[2]["height"] = "621"
+
+    expected = json.loads(
+        createManifest(base_url=BASE_URL, canvases=canvases, **kwargs).json_dumps()
+    )
+    actual = buildManifest(base_url=BASE_URL, canvases=iter(canvases), **kwargs)
+
+    assert actual == expected
+    assert json.dumps(actual) == json.dumps(expected)
+
+
+def test_build_manifest_requires_label_and_canvases():
+    with pytest.raises(ValueError):
+        buildManifest(base_url=BASE_URL, labels=[], canvases=make_canvases(1))
+    with pytest.raises(ValueError):
+        buildManifest(base_url=BASE_URL, labels=["Empty"], canvases=[])
+
+
+@pytest.mark.parametrize("kwargs", MANIFEST_KWARGS)
+def test_write_manifest_matches_build_manifest(kwargs, tmp_path):
+    canvases = make_canvases(3, with_metadata=True)
+    expected = json.dumps(buildManifest(base_url=BASE_URL, canvases=canvases, **kwargs))
+
+    text = io.StringIO()
+    assert writeManifest(text, BASE_URL, canvases=iter(canvases), **kwargs) == 3
+    binary = io.BytesIO()
+    writeManifest(binary, BASE_URL, canvases=canvases, **kwargs)
+    path = tmp_path / "manifest.json"
+    writeManifest(path, BASE_URL, canvases=canvases, **kwargs)
+
+    assert text.getvalue() == expected
+    assert binary.getvalue().decode("utf-8") == expected
+    assert path.read_text(encoding="utf-8") == expected
+
+
+def test_write_manifest_requires_canvases():
+    output = io.StringIO()
+    with pytest.raises(ValueError):
+        writeManifest(output, BASE_URL, labels=["Empty"], canvases=iter([]))
+    assert output.getvalue() == ""
+
+
+def test_write_manifest_memory_is_flat():
+    class NullWriter(io.TextIOBase):
+        def write(self, text):
+            return len(text)
+
+    def peak_memory(count):
+        canvases = (make_canvases(1)[0] for _ in range(count))
+        tracemalloc.start()
+        writeManifest(NullWriter(), BASE_URL, labels=["Test"], canvases=canvases)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    assert peak_memory(5000) < 2 * peak_memory(50)
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_create_manifest_concurrently():
+    base_urls = [f"{BASE_URL[:-1]}{idx}" for idx in range(32)]
+    canvases = make_canvases(20, with_metadata=True)
+    global_base_url = iiifpapi3.BASE_URL
+
+    def create(base_url):
+        manifest = createManifest(base_url=base_url, labels=["Test"], canvases=canvases)
+        return json.loads(manifest.json_dumps())
+
+    expected = [
+        buildManifest(base_url=base_url, labels=["Test"], canvases=canvases)
+        for base_url in base_urls
+    ]
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often to surface shared state
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for _ in range(3):
+                assert list(pool.map(create, base_urls)) == expected
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert iiifpapi3.BASE_URL == global_base_url
+
+
+@pytest.mark.filterwarnings("ignore")
+@pytest.mark.parametrize("kwargs", MANIFEST_KWARGS)
+def test_validate_manifest(kwargs, tmp_path):
+    manifest = buildManifest(base_url=BASE_URL, canvases=make_canvases(2), **kwargs)
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps(manifest))
+
+    validateManifest(manifest)
+    validateManifest(str(path))
+    validateManifest(json.dumps(manifest), read_from_file=False)
+    createManifest(
+        base_url=BASE_URL, canvases=make_canvases(2), validate=True, **kwargs
+    )
+    assert getManifestValidator() is getManifestValidator()
+
+
+def test_validate_manifest_invalid():
+    manifest = buildManifest(
+        base_url=BASE_URL, labels=["Test"], canvases=make_canvases(1)
+    )
+    manifest["items"][0]["width"] = 0
+    with pytest.raises(jsonschema.ValidationError):
+        validateManifest(manifest)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_validate_manifests(executor, tmp_path):
+    valid = buildManifest(base_url=BASE_URL, labels=["Test"], canvases=make_canvases(2))
+    invalid = json.loads(json.dumps(valid))
+    del invalid["label"]
+    invalid["items"][1]["type"] = "Manifest"
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps(valid))
+    missing = tmp_path / "missing.json"
+
+    results = validateManifests(
+        [valid, invalid, str(path), missing], workers=2, executor=executor
+    )
+
+    assert [result.ok for result in results] == [True, False, True, False]
+    assert [result.manifest_id for result in results] == [
+        BASE_URL,
+        BASE_URL,
+        str(path),
+        str(missing),
+    ]
+    assert results[1].errors
+
+
+@pytest.mark.filterwarnings("ignore")
+@pytest.mark.parametrize("kwargs", MANIFEST_KWARGS)
+def test_validate_manifest_bundled_schema(kwargs):
+    manifest = buildManifest(
+        base_url=BASE_URL, canvases=make_canvases(3, with_metadata=True), **kwargs
+    )
+    validateManifest(manifest)
+
+    for invalid in (
+        dict(manifest, rights="not a url"),
+        dict(manifest, behavior=["not-a-behavior"]),
+        dict(manifest, label={"en": "not a list"}),
+        {key: value for key, value in manifest.items() if key != "items"},
+    ):
+        with pytest.raises(jsonschema.ValidationError):
+            validateManifest(invalid)
+
+
+def test_set_manifest_schema_overrides_bundled_schema(mocker):
+    urlopen = mocker.patch("urllib.request.urlopen")
+    bundled = getManifestSchema()
+    assert bundled["$schema"] == "http://json-schema.org/draft-07/schema#"
+
+    setManifestSchema({"type": "object"})
+    try:
+        validateManifest({"id": "https://example.org/manifest"})
+    finally:
+        setManifestSchema(None)
+
+    assert getManifestSchema() == bundled
+    with pytest.raises(jsonschema.ValidationError):
+        validateManifest({"id": "https://example.org/manifest"})
+    urlopen.assert_not_called()
+
+
+def test_update_manifest():
+    canvases = make_canvases(6)
+    manifest = buildManifest(base_url=BASE_URL, labels=["Test"], canvases=canvases[:4])
+    untouched = manifest["items"][0]
+    replacement = dict(canvases[1], label="Replaced", height=100)
+
+    result = updateManifest(
+        manifest, canvases=[replacement, *canvases[4:]], remove=["TESTASSET2"]
+    )
+
+    assert result == {"added": 2, "replaced": 1, "removed": 1}
+    expected_canvases = [canvases[0], replacement, canvases[3], *canvases[4:]]
+    assert manifest == buildManifest(
+        base_url=BASE_URL, labels=["Test"], canvases=expected_canvases
+    )
+    assert manifest["items"][0] is untouched
+
+
+def test_update_manifest_remove_missing():
+    manifest = buildManifest(
+        base_url=BASE_URL, labels=["Test"], canvases=make_canvases(2)
+    )
+    expected = json.loads(json.dumps(manifest))
+    with pytest.raises(KeyError):
+        updateManifest(manifest, canvases=make_canvases(3), remove=["MISSING"])
+    assert manifest == expected
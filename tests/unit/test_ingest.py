@@ -0,0 +1,242 @@
+import gzip
+import json
+
+import pytest
+import requests
+
+import IIIFingest.ingest
+from IIIFingest.ingest import (
+    JobMonitor,
+    chunkIngestAssets,
+    encodeRequestBody,
+    iterJobStatus,
+    pingJob,
+    pollDelay,
+    sendIngestRequest,
+    serializeJson,
+)
+from IIIFingest.settings import JOB_POLL_DEADLINE
+
+
+def make_assets(count):
+    return [
+        {"identifier": f"TEST:ASSET{idx}", "space": "testing"} for idx in range(count)
+    ]
+
+
+def test_chunk_ingest_assets_by_count():
+    assets = make_assets(10)
+    chunks = chunkIngestAssets(assets, max_assets=4)
+
+    assert [len(chunk) for chunk in chunks] == [2, 4, 4]
+    assert [asset for chunk in chunks for asset in chunk] == assets
+
+
+def test_chunk_ingest_assets_by_size():
+    assets = make_assets(10)
+    asset_size = len(serializeJson(assets[0])) + 1
+    chunks = chunkIngestAssets(
+        assets, max_bytes=3 * asset_size, reserved_bytes=2 * asset_size
+    )
+
+    # The final chunk keeps room for the reserved bytes
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+    assert [asset for chunk in chunks for asset in chunk] == assets
+
+
+def test_chunk_ingest_assets_empty():
+    assert chunkIngestAssets([]) == [[]]
+    with pytest.raises(ValueError):
+        chunkIngestAssets(make_assets(1), max_assets=0)
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_serialize_json(use_orjson, monkeypatch):
+    if not use_orjson:
+        monkeypatch.setattr(IIIFingest.ingest, "orjson", None)
+    elif IIIFingest.ingest.orjson is None:
+        pytest.skip("orjson is not installed")
+    req = {"assets": make_assets(3), "label": "caf\u00e9"}
+
+    assert json.loads(serializeJson(req)) == req
+
+
+def test_encode_request_body_gzip():
+    req = {"assets": make_assets(100)}
+
+    body, headers = encodeRequestBody(req, gzip_threshold=100)
+    assert headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(body)) == req
+
+    body, headers = encodeRequestBody(req, gzip_threshold=len(body) * 100)
+    assert "Content-Encoding" not in headers
+    assert json.loads(body) == req
+
+    body, headers = encodeRequestBody(req, serializer=lambda r: b"{}")
+    assert body == b"{}" and headers == {"Content-Type": "application/json"}
+
+
+def test_send_ingest_request(mocker):
+    session = mocker.Mock()
+    req = {"assets": make_assets(100)}
+
+    sendIngestRequest(req, "https://example.org", "token", session, gzip_threshold=1)
+
+    kwargs = session.post.call_args[1]
+    assert kwargs["headers"] == {
+        "Authorization": "Bearer token",
+        "Content-Type": "application/json",
+        "Content-Encoding": "gzip",
+    }
+    assert json.loads(gzip.decompress(kwargs["data"])) == req
+
+
+def test_job_monitor(mocker):
+    statuses = {
+        "a": ["queued", "running", "success"],
+        "b": ["failed"],
+        "c": ["running"] * 10,
+        "d": [requests.ConnectionError("down"), "success"],
+    }
+
+    def get(url, timeout):
+        status = statuses[url.rsplit("/", 1)[-1]].pop(0)
+        if isinstance(status, Exception):
+            raise status
+        response = mocker.Mock()
+        response.json.return_value = {"data": {"job_status": status}}
+        return response
+
+    session = mocker.Mock()
+    session.get.side_effect = get
+    on_complete = mocker.Mock()
+    monitor = JobMonitor(
+        endpoint="https://example.org/jobstatus/",
+        interval=0,
+        max_pings=3,
+        session=session,
+        on_complete=on_complete,
+    )
+    for job_id in statuses:
+        monitor.add(job_id)
+    assert len(monitor) == 4 and "a" in monitor
+
+    results = monitor.run()
+
+    assert len(monitor) == 0
+    assert {job_id: r.job_status for job_id, r in results.items()} == {
+        "a": "success",
+        "b": "failed",
+        "c": "running",
+        "d": "success",
+    }
+    assert {job_id: r.pings for job_id, r in results.items()} == {
+        "a": 3,
+        "b": 1,
+        "c": 3,
+        "d": 2,
+    }
+    assert sorted(job_id for job_id, r in results.items() if r.completed) == ["a", "d"]
+    assert session.get.call_count == 9
+    assert on_complete.call_count == 4
+
+
+def test_job_monitor_updates(mocker):
+    response = mocker.Mock()
+    response.json.return_value = {"data": {"job_status": "running"}}
+    session = mocker.Mock(**{"get.return_value": response})
+    monitor = JobMonitor(interval=0, max_pings=2, session=session)
+    monitor.add("a")
+
+    updates = list(monitor.updates())
+
+    assert [(u.job_id, u.pings, u.done) for u in updates] == [
+        ("a", 1, False),
+        ("a", 2, True),
+    ]
+
+
+def test_job_monitor_reuses_pool(mocker):
+    response = mocker.Mock()
+    response.json.return_value = {"data": {"job_status": "running"}}
+    session = mocker.Mock(**{"get.return_value": response})
+    create_executor = mocker.spy(IIIFingest.ingest, "create_executor")
+    monitor = JobMonitor(interval=0, max_pings=3, max_workers=2, session=session)
+    for job_id in ["a", "b", "c"]:
+        monitor.add(job_id)
+
+    results = monitor.run()
+
+    assert {r.pings for r in results.values()} == {3}
+    assert create_executor.call_count == 1
+    assert monitor._pool is None
+
+
+def test_poll_delay():
+    delays = [pollDelay(attempt, 1, 10, 2, jitter=0) for attempt in range(1, 7)]
+    assert delays == [1, 2, 4, 8, 10, 10]
+    for _ in range(100):
+        assert 0.9 <= pollDelay(1, 1, 10, 2, jitter=0.1) <= 1.1
+
+
+def make_status_session(mocker, statuses):
+    def get(url, timeout):
+        response = mocker.Mock()
+        response.json.return_value = {"data": {"job_status": statuses.pop(0)}}
+        return response
+
+    return mocker.Mock(**{"get.side_effect": get})
+
+
+def test_iter_job_status(mocker):
+    sleep = mocker.patch("IIIFingest.ingest.time.sleep")
+    session = make_status_session(
+        mocker, ["queued", "queued", "running", "running", "running", "success"]
+    )
+
+    updates = list(iterJobStatus("a", session=session, jitter=0))
+
+    assert [(u.job_status, u.pings, u.done) for u in updates] == [
+        ("queued", 1, False),
+        ("running", 3, False),
+        ("success", 6, True),
+    ]
+    assert updates[-1].completed
+    assert [call[0][0] for call in sleep.call_args_list] == [1, 2, 4, 8, 16]
+
+
+def test_iter_job_status_limits(mocker):
+    mocker.patch("IIIFingest.ingest.time.sleep")
+    session = make_status_session(mocker, ["running"] * 10)
+    updates = list(iterJobStatus("a", session=session, max_pings=3))
+    assert [(u.pings, u.done) for u in updates] == [(1, False), (3, True)]
+
+    updates = list(iterJobStatus("a", session=session, deadline=0))
+    assert [(u.pings, u.done, u.completed) for u in updates] == [(1, True, False)]
+
+
+def test_ping_job(mocker):
+    mocker.patch("IIIFingest.ingest.time.sleep")
+    session = make_status_session(mocker, ["queued", "failed"])
+
+    status = pingJob("a", session=session)
+
+    assert status["completed"] is False
+    assert status["job_status"] == "failed"
+    assert status["pings"] == 2
+
+
+def test_ping_job_default_deadline(mocker):
+    clock = [0.0]
+    mocker.patch("IIIFingest.ingest.time.monotonic", side_effect=lambda: clock[0])
+    sleep = mocker.patch(
+        "IIIFingest.ingest.time.sleep",
+        side_effect=lambda seconds: clock.__setitem__(0, clock[0] + seconds),
+    )
+    session = make_status_session(mocker, ["running"] * 25)
+
+    status = pingJob("a", session=session, jitter=0)
+
+    assert status["job_status"] == "running"
+    assert status["pings"] < 25
+    assert sum(call[0][0] for call in sleep.call_args_list) == JOB_POLL_DEADLINE
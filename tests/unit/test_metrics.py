@@ -0,0 +1,99 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from IIIFingest.asset import get_image_size, get_mime_type
+from IIIFingest.bucket import md5_fileobj
+from IIIFingest.ingest import sendIngestRequest
+from IIIFingest.metrics import (
+    InMemoryMetrics,
+    MetricsCollector,
+    get_metrics,
+    set_metrics,
+)
+
+
+@pytest.fixture
+def metrics():
+    collector = set_metrics(InMemoryMetrics())
+    yield collector
+    set_metrics(None)
+
+
+def test_default_metrics_are_discarded():
+    collector = get_metrics()
+    assert type(collector) is MetricsCollector
+    with collector.timer("iiifingest_test_seconds"):
+        collector.increment("iiifingest_test_total")
+
+
+def test_in_memory_metrics():
+    collector = InMemoryMetrics(buckets=(0.1, 1))
+    collector.increment("requests_total", labels={"status": 200})
+    collector.increment("requests_total", 2, labels={"status": 200})
+    for value in (0.05, 0.5, 5):
+        collector.observe("request_seconds", value)
+    with collector.timer("request_seconds"):
+        pass
+
+    assert collector.counter("requests_total", {"status": "200"}) == 3
+    assert collector.counter("requests_total") == 0
+    histogram = collector.histogram("request_seconds")
+    assert histogram.count == 4
+    assert histogram.counts == [2, 1]
+    assert histogram.sum == pytest.approx(5.55, abs=0.01)
+
+    collector.reset()
+    assert collector.counter("requests_total", {"status": 200}) == 0
+    assert collector.to_prometheus() == ""
+
+
+def test_prometheus_format():
+    collector = InMemoryMetrics(buckets=(0.1, 1))
+    collector.increment("requests_total", labels={"status": 200, "path": 'a"b'})
+    collector.observe("request_seconds", 0.5, labels={"mode": "fast"})
+
+    assert collector.to_prometheus().splitlines() == [
+        "# TYPE requests_total counter",
+        'requests_total{path="a\\"b",status="200"} 1',
+        "# TYPE request_seconds histogram",
+        'request_seconds_bucket{mode="fast",le="0.1"} 0',
+        'request_seconds_bucket{mode="fast",le="1"} 1',
+        'request_seconds_bucket{mode="fast",le="+Inf"} 1',
+        'request_seconds_sum{mode="fast"} 0.5',
+        'request_seconds_count{mode="fast"} 1',
+    ]
+
+
+def test_in_memory_metrics_thread_safe():
+    collector = InMemoryMetrics()
+
+    def record(_):
+        for _ in range(1000):
+            collector.increment("calls_total")
+            collector.observe("call_seconds", 0.01)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(record, range(8)))
+
+    assert collector.counter("calls_total") == 8000
+    assert collector.histogram("call_seconds").count == 8000
+
+
+def test_pipeline_stages_recorded(metrics, test_images, mocker):
+    image_path = test_images["27.586.1-cm-2016-02-09.tif"]["filepath"]
+    get_image_size(image_path)
+    with open(image_path, "rb") as fp:
+        fileobj = io.BytesIO(fp.read())
+    get_mime_type(fileobj)
+    md5_fileobj(fileobj)
+    session = mocker.Mock(**{"post.return_value.status_code": 200})
+    sendIngestRequest({"assets": []}, "https://example.org", "token", session)
+
+    assert metrics.histogram("iiifingest_probe_seconds").count == 1
+    assert metrics.histogram("iiifingest_mime_sniff_seconds").count == 1
+    assert metrics.counter("iiifingest_hash_bytes_total") == len(fileobj.getvalue())
+    assert metrics.histogram("iiifingest_ingest_request_seconds").count == 1
+    assert metrics.counter("iiifingest_ingest_requests_total", {"status": 200}) == 1
+    assert "iiifingest_hash_seconds_count 1" in metrics.to_prometheus()
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from IIIFingest.pipeline import Pipeline, StageStats
+
+
+def test_pipeline_runs_stages_concurrently():
+    pipeline = Pipeline(queue_size=2)
+    active = []
+    overlap = threading.Event()
+
+    def slow_square(item):
+        active.append(item)
+        if len(active) > 1:
+            overlap.set()
+        time.sleep(0.01)
+        active.remove(item)
+        return item * item
+
+    items = pipeline.feed(range(20))
+    items = pipeline.stage("square", slow_square, items, workers=4)
+    items = pipeline.stage("negate", lambda item: -item, items)
+    results = list(pipeline.results(items))
+    pipeline.join()
+
+    assert sorted(results) == sorted(-i * i for i in range(20))
+    assert overlap.is_set()
+    assert pipeline.stages["square"].items == 20
+    assert pipeline.stages["square"].workers == 4
+    assert pipeline.stages["negate"].items == 20
+    assert pipeline.stages["square"].busy_seconds > pipeline.stages["square"].seconds
+
+
+def test_pipeline_raises_stage_error():
+    pipeline = Pipeline(queue_size=1)
+
+    def fail(item):
+        if item == 3:
+            raise ValueError("bad item")
+        return item
+
+    items = pipeline.stage("fail", fail, pipeline.feed(range(100)), workers=2)
+    list(pipeline.results(items))
+    with pytest.raises(ValueError, match="bad item"):
+        pipeline.join()
+
+
+def test_pipeline_cancel():
+    cancel = threading.Event()
+    pipeline = Pipeline(cancel=cancel, queue_size=1)
+    items = pipeline.stage("identity", lambda item: item, pipeline.feed(range(1000)))
+
+    results = []
+    for item in pipeline.results(items):
+        results.append(item)
+        if len(results) == 5:
+            cancel.set()
+    pipeline.join()
+
+    # Items already fed when cancelled still come out of the last stage
+    assert results == list(range(len(results)))
+    assert 5 <= len(results) < 1000
+    assert pipeline.stages["identity"].items == len(results)
+
+
+def test_stage_stats():
+    stats = StageStats(name="test")
+    assert stats.throughput == 0.0
+    stats.add(10.0, 11.0)
+    stats.add(10.5, 12.0, items=3)
+
+    assert stats.items == 4
+    assert stats.busy_seconds == 2.5
+    assert stats.seconds == 2.0
+    assert stats.throughput == 2.0
@@ -0,0 +1,121 @@
+import io
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image, features
+
+from IIIFingest.probe import read_image_size, sniff_mime_type
+
+WIDTH = 317
+HEIGHT = 211
+
+
+def save_image(path, format, **kwargs):
+    Image.new("RGB", (WIDTH, HEIGHT), (120, 30, 40)).save(path, format, **kwargs)
+    return path
+
+
+def tiff_bytes(endian, bigtiff=False):
+    """Builds a minimal single-IFD (Big)TIFF header with LONG dimensions."""
+    mark = b"II" if endian == "<" else b"MM"
+    if bigtiff:
+        header = mark + struct.pack(endian + "HHHQ", 43, 8, 0, 16)
+        ifd = struct.pack(endian + "Q", 2)
+        ifd += struct.pack(endian + "HHQQ", 256, 16, 1, WIDTH)
+        ifd += struct.pack(endian + "HHQQ", 257, 16, 1, HEIGHT)
+    else:
+        header = mark + struct.pack(endian + "HI", 42, 8)
+        ifd = struct.pack(endian + "H", 2)
+        ifd += struct.pack(endian + "HHII", 256, 4, 1, WIDTH)
+        ifd += struct.pack(endian + "HHIH", 257, 3, 1, HEIGHT) + b"\0\0"
+    return header + ifd
+
+
+@pytest.mark.parametrize(
+    "format,kwargs",
+    [
+        ("TIFF", {}),
+        ("TIFF", {"compression": "tiff_lzw"}),
+        ("JPEG", {"exif": Image.Exif(), "icc_profile": b"\0" * 70000}),
+        ("JPEG", {"progressive": True}),
+        ("PNG", {}),
+    ],
+)
+def test_read_image_size(tmp_path, format, kwargs):
+    path = save_image(tmp_path / f"image.{format.lower()}", format, **kwargs)
+    assert read_image_size(str(path)) == (WIDTH, HEIGHT)
+
+
+@pytest.mark.skipif(not features.check("jpg_2000"), reason="requires openjpeg")
+@pytest.mark.parametrize("suffix", ["jp2", "j2k"])
+def test_read_image_size_jpeg2000(tmp_path, suffix):
+    path = save_image(tmp_path / f"image.{suffix}", "JPEG2000")
+    assert read_image_size(str(path)) == Image.open(path).size == (WIDTH, HEIGHT)
+
+
+@pytest.mark.parametrize("endian", ["<", ">"])
+@pytest.mark.parametrize("bigtiff", [False, True])
+def test_read_image_size_tiff_headers(endian, bigtiff):
+    fileobj = io.BytesIO(tiff_bytes(endian, bigtiff))
+    assert read_image_size(fileobj) == (WIDTH, HEIGHT)
+
+
+def test_read_image_size_restores_position(tmp_path):
+    path = save_image(tmp_path / "image.png", "PNG")
+    fileobj = io.BytesIO(b"prefix" + path.read_bytes())
+    fileobj.seek(6)
+
+    assert read_image_size(fileobj) == (WIDTH, HEIGHT)
+    assert fileobj.tell() == 6
+
+
+@pytest.mark.parametrize(
+    "data", [b"GIF89a" + b"\0" * 20, b"II*\0\xff\xff\xff\x00", b"\xff\xd8\xff\xe0"]
+)
+def test_read_image_size_unknown_or_truncated(data):
+    assert read_image_size(io.BytesIO(data)) is None
+
+
+def test_get_image_size_falls_back_to_pil(tmp_path):
+    from IIIFingest.asset import get_image_size
+
+    path = save_image(tmp_path / "image.gif", "GIF")
+    assert read_image_size(str(path)) is None
+    assert get_image_size(str(path)) == (WIDTH, HEIGHT)
+
+
+@pytest.mark.parametrize(
+    "format,suffix",
+    [("TIFF", "tif"), ("JPEG", "jpg"), ("PNG", "png"), ("JPEG2000", "jp2")],
+)
+def test_sniff_mime_type_matches_libmagic(tmp_path, format, suffix):
+    import magic
+
+    if format == "JPEG2000" and not features.check("jpg_2000"):
+        pytest.skip("requires openjpeg")
+    path = save_image(tmp_path / f"image.{suffix}", format)
+    header = path.read_bytes()[:2048]
+
+    assert sniff_mime_type(header) == magic.from_buffer(header, mime=True)
+
+
+def test_sniff_mime_type_unknown():
+    assert sniff_mime_type(b"GIF89a") is None
+
+
+def test_get_mime_type_falls_back_to_libmagic(tmp_path):
+    from IIIFingest.asset import get_mime_type
+
+    path = save_image(tmp_path / "image.gif", "GIF")
+    with open(path, "rb") as fileobj:
+        assert get_mime_type(fileobj) == "image/gif"
+
+
+def test_magic_detector_is_cached_per_thread():
+    from IIIFingest.asset import _get_magic
+
+    detector = _get_magic()
+    assert _get_magic() is detector
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert pool.submit(_get_magic).result() is not detector
@@ -0,0 +1,80 @@
+import io
+import json
+
+import pytest
+
+from IIIFingest.tracing import (
+    TraceWriter,
+    analyze_trace,
+    format_report,
+    open_trace,
+    read_trace,
+)
+
+
+def make_record(idx, upload_seconds):
+    return {
+        "event": "upload",
+        "asset_id": f"ASSET{idx}",
+        "s3key": f"testing/{idx}.tif",
+        "bytes": 1000 + idx,
+        "probe_start": 0.0,
+        "probe_end": 0.5,
+        "upload_start": 0.5,
+        "upload_end": 0.5 + upload_seconds,
+    }
+
+
+def test_trace_writer_appends(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    with TraceWriter(path) as writer:
+        writer.write(make_record(0, 1))
+        assert list(read_trace(path)) == [make_record(0, 1)]
+    with open_trace(path) as writer:
+        writer.write(make_record(1, 2))
+
+    assert list(read_trace(path)) == [make_record(0, 1), make_record(1, 2)]
+
+
+def test_trace_writer_file_object():
+    output = io.StringIO()
+    with open_trace(TraceWriter(output)) as writer:
+        writer.write(make_record(0, 1))
+    with open_trace(None) as writer:
+        assert writer is None
+
+    assert not output.closed
+    assert json.loads(output.getvalue()) == make_record(0, 1)
+
+
+def test_analyze_trace():
+    records = [make_record(idx, idx + 1) for idx in range(100)]
+    records.append(
+        {"event": "ingest", "asset_id": "ASSET0", "ingest_start": 0, "ingest_end": 200}
+    )
+
+    summary = analyze_trace(records, top=3)
+
+    assert summary["assets"] == 100
+    assert summary["stages"]["probe"] == {
+        "count": 100,
+        "p50": 0.5,
+        "p95": 0.5,
+        "p99": 0.5,
+        "max": 0.5,
+    }
+    upload = summary["stages"]["upload"]
+    assert (upload["p50"], upload["p95"], upload["p99"]) == (50, 95, 99)
+    assert upload["max"] == 100
+    assert summary["stages"]["ingest"]["count"] == 1
+    assert [a["asset_id"] for a in summary["slowest"]] == [
+        "ASSET0",
+        "ASSET99",
+        "ASSET98",
+    ]
+    assert summary["slowest"][0]["seconds"] == pytest.approx(201.5)
+    assert summary["slowest"][0]["bytes"] == 1000
+
+    report = format_report(summary)
+    assert report.splitlines()[0] == "100 assets"
+    assert "ASSET99 testing/99.tif" in report